@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
 import uuid
@@ -8,14 +8,40 @@ from dotenv import load_dotenv
 import openai
 import tempfile
 import json
+import re
 from werkzeug.utils import secure_filename
-from moviepy.editor import VideoFileClip
+from moviepy.editor import VideoFileClip, concatenate_audioclips
 import threading
+from collections import OrderedDict, deque
+import time
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import multiprocessing
 import cv2
 import numpy as np
-from PIL import Image
-import io
 import base64
+import sys
+import gc
+import inspect
+import tracemalloc
+import gzip
+import hashlib
+import mimetypes
+import subprocess
+import requests
+import zipfile
+import msgpack
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Brotli variants are skipped; gzip is always built
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Not available on Windows; RSS is then only read from /proc
 
 # Load environment variables
 load_dotenv()
@@ -46,41 +72,580 @@ os.makedirs("static/js", exist_ok=True)
 # In production, use a proper database
 videos_db = {}
 courses_db = {}
+batches_db = {}
+video_hashes = {}  # content SHA-256 -> video_id, for de-duplicating ingested files
+course_videos = {}  # course_id -> video_id it was generated from
+
+# Batch content analysis: narrations are packed into a single model call up to
+# this many estimated tokens, and batches are sent concurrently
+ANALYSIS_BATCH_TOKEN_BUDGET = int(os.getenv("ANALYSIS_BATCH_TOKEN_BUDGET", "3000"))
+ANALYSIS_BATCH_MAX_ITEMS = int(os.getenv("ANALYSIS_BATCH_MAX_ITEMS", "8"))
+ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", "4"))
+
+# Transcript chunk size (in words) used to find the span a section was generated from
+TRANSCRIPT_CHUNK_WORDS = 120
+
+# Snapshot extraction: SNAPSHOT_WORKERS > 0 scans the snapshot slots in that many
+# parallel processes, seeking to a SNAPSHOT_SAMPLE_WINDOW-second window in each slot
+# and sampling a frame every SNAPSHOT_SAMPLE_INTERVAL seconds; 0 seeks straight to
+# fixed positions in a single thread
+SNAPSHOT_WORKERS = int(os.getenv("SNAPSHOT_WORKERS", "0"))
+SNAPSHOT_SAMPLE_INTERVAL = float(os.getenv("SNAPSHOT_SAMPLE_INTERVAL", "0.5"))
+SNAPSHOT_SAMPLE_WINDOW = float(os.getenv("SNAPSHOT_SAMPLE_WINDOW", "1.0"))
+
+# Speech-activity detection before transcription: silences longer than
+# VAD_MIN_SILENCE seconds are cut down to VAD_KEEP_SILENCE seconds
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_SECONDS = 0.03
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "12"))
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", "1.0"))
+VAD_KEEP_SILENCE = float(os.getenv("VAD_KEEP_SILENCE", "0.3"))
+VAD_SPEECH_CEILING_DB = float(os.getenv("VAD_SPEECH_CEILING_DB", "-45"))  # anything louder always counts as speech
+
+# Static asset pipeline (`flask --app app build-assets`): third-party bundles are
+# vendored into static/vendor and fingerprinted, precompressed copies go to static/dist
+STATIC_DIST_DIR = os.path.join("static", "dist")
+STATIC_VENDOR_DIR = os.path.join("static", "vendor")
+
+# Processing job limits: each job must finish within JOB_TIMEOUT seconds and each
+# stage within its own timeout. Uploads are deleted once a job ends unless KEEP_UPLOADS=1.
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "3600"))
+STAGE_TIMEOUTS = {
+    "transcript": float(os.getenv("STAGE_TIMEOUT_TRANSCRIPT", "1200")),
+    "snapshots": float(os.getenv("STAGE_TIMEOUT_SNAPSHOTS", "900")),
+    "course": float(os.getenv("STAGE_TIMEOUT_COURSE", "1200")),
+}
+KEEP_UPLOADS = os.getenv("KEEP_UPLOADS", "0") == "1"
+JOB_POLL_INTERVAL = 0.5
+job_controls = {}  # video_id -> cancel event and deadlines of a running job
+current_job = threading.local()  # video_id of the job running on this thread
+model_call_executor = ThreadPoolExecutor(max_workers=16)
+
+# Memory accounting for processing jobs: JOB_MEMORY_PROFILING=1 records RSS and
+# tracemalloc figures per stage on the job; JOB_MEMORY_BUDGET_MB limits the process
+# RSS growth charged to a job within one stage (0 disables the limit). RSS is
+# process-wide, so growth is only charged in full while a single job is inside a
+# stage. While several are, the process RSS ceiling (JOB_MEMORY_PROCESS_LIMIT_MB,
+# by default the RSS when the first stage starts plus one budget per pipeline
+# stage worker) stops the job that growth is most attributed to, by the CPU time
+# each job's thread used while RSS grew.
+JOB_MEMORY_PROFILING = os.getenv("JOB_MEMORY_PROFILING", "0") == "1"
+JOB_MEMORY_BUDGET_MB = float(os.getenv("JOB_MEMORY_BUDGET_MB", "0"))
+JOB_MEMORY_PROCESS_LIMIT_MB = float(os.getenv("JOB_MEMORY_PROCESS_LIMIT_MB", "0"))
+JOB_MEMORY_SAMPLE_INTERVAL = 0.2
+SNAPSHOT_REDUCED_COUNT = 8  # snapshots taken instead when extraction goes over the memory budget
+SNAPSHOT_REDUCED_SIZE = (640, 480)
+memory_stage_lock = threading.Lock()
+memory_stage_jobs = {}  # video_id -> job control, for jobs currently inside a memory-sampled stage
+memory_process_ceiling = None  # RSS in MB above which the process RSS ceiling stops a job
+profiler_lines = None
+
+# Batch ingestion: items flow through one shared pipeline with a worker pool per
+# stage, so audio extraction, decoding and model calls overlap across videos
+PIPELINE_WORKERS = {
+    "transcript": int(os.getenv("INGEST_AUDIO_WORKERS", "2")),
+    "snapshots": int(os.getenv("INGEST_DECODE_WORKERS", "2")),
+    "course": int(os.getenv("INGEST_API_WORKERS", "4")),
+}
+INGEST_ROOT = os.getenv("INGEST_ROOT")  # local paths can only be ingested from under this directory
+pipeline_queues = [OrderedDict() for _ in PIPELINE_WORKERS]  # per stage: batch_id -> queued video_ids
+pipeline_condition = threading.Condition()
+pipeline_started = False
+
+# Progress credited to a batch item for each in-flight status; finished statuses count as 1
+BATCH_STATUS_PROGRESS = {
+    "uploaded": 0.0,
+    "queued": 0.0,
+    "processing": 0.1,
+    "transcript_extracted": 0.4,
+    "snapshots_extracted": 0.7,
+}
+
+# Course bundles: inline images are stored once as files and referenced from the
+# MessagePack course structure as {BUNDLE_IMAGE_KEY: "images/<name>"}
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_IMAGE_KEY = "$bundle_image"
+
+# Full-text search index over transcripts and courses (SQLite FTS5).
+# In-memory by default like the stores above; set SEARCH_DB_PATH to persist it.
+SEARCH_DB_PATH = os.getenv("SEARCH_DB_PATH", ":memory:")
+search_db = sqlite3.connect(SEARCH_DB_PATH, check_same_thread=False)
+search_lock = threading.Lock()
+
+class JobCancelled(BaseException):
+    """Raised inside a processing job once it is cancelled or past a deadline.
+
+    Derives from BaseException (like asyncio.CancelledError) so the broad
+    `except Exception` fallbacks along the pipeline don't swallow it.
+    """
+    
+    def __init__(self, message, status="cancelled"):
+        super().__init__(message)
+        self.status = status
+
+def new_job_control():
+    """Cancellation and deadline state for a job; only time spent inside stages counts against JOB_TIMEOUT"""
+    return {
+        "cancel": threading.Event(),
+        "budget": JOB_TIMEOUT,
+        "deadline": None,
+        "stage": None,
+        "stage_started": None,
+        "stage_deadline": None,
+        "rss_last": None,
+        "memory_charged": 0.0,
+        "memory_attributed": 0.0,
+        "thread_id": None,
+        "memory_exceeded": None  # reason, once the job has gone over its memory budget
+    }
+
+def start_stage(video_id, stage):
+    """Enter a pipeline stage, starting its deadline"""
+    control = job_controls.get(video_id)
+    if control is None:
+        return
+    now = time.monotonic()
+    control["stage"] = stage
+    control["stage_started"] = now
+    control["stage_deadline"] = now + STAGE_TIMEOUTS[stage]
+    control["deadline"] = now + control["budget"]
+    check_job(video_id)
+
+def end_stage(video_id):
+    """Leave a pipeline stage, charging the time spent to the job's budget"""
+    control = job_controls.get(video_id)
+    if control is None or control["stage_started"] is None:
+        return
+    control["budget"] -= time.monotonic() - control["stage_started"]
+    control["stage_started"] = None
+    control["stage_deadline"] = None
+    control["deadline"] = None
+
+def check_job(video_id):
+    """Raise JobCancelled if the job has been cancelled or has run past a deadline"""
+    control = job_controls.get(video_id)
+    if control is None:
+        return
+    if control["cancel"].is_set():
+        raise JobCancelled("Cancelled by user")
+    now = time.monotonic()
+    if control["deadline"] is not None and now > control["deadline"]:
+        raise JobCancelled("Job exceeded its deadline", status="timed_out")
+    if control["stage_deadline"] is not None and now > control["stage_deadline"]:
+        raise JobCancelled(f"Stage '{control['stage']}' exceeded its deadline", status="timed_out")
+    if control["memory_exceeded"]:
+        raise JobCancelled(control["memory_exceeded"], status="memory_exceeded")
+
+def check_current_job():
+    """Cooperative cancellation point for code running on a job's thread"""
+    video_id = getattr(current_job, "video_id", None)
+    if video_id is not None:
+        check_job(video_id)
+
+def job_time_remaining(video_id):
+    """Seconds left before the job's nearest deadline"""
+    control = job_controls[video_id]
+    if control["deadline"] is None:
+        return control["budget"]
+    return min(control["deadline"], control["stage_deadline"]) - time.monotonic()
+
+def accepts_request_timeout(fn):
+    """Whether an OpenAI function takes request_timeout rather than sending it to the API as a field
+
+    openai.Audio.transcribe merges unknown kwargs into the form data, so
+    transcriptions go through transcribe_audio instead.
+    """
+    if fn == openai.ChatCompletion.create:
+        return True
+    try:
+        return "request_timeout" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+def transcribe_audio(audio_file, model="whisper-1", request_timeout=None, **params):
+    """Transcribe an audio file with Whisper, with an HTTP timeout on the upload
+
+    Same request as openai.Audio.transcribe, but request_timeout is handed
+    to the requestor instead of being posted as a form field.
+    """
+    requestor = openai.api_requestor.APIRequestor()
+    files = [("file", (audio_file.name, audio_file, "application/octet-stream"))]
+    response, _, api_key = requestor.request(
+        "post",
+        "/audio/transcriptions",
+        params={"model": model, **params},
+        files=files,
+        request_timeout=request_timeout
+    )
+    return openai.util.convert_to_openai_object(response, api_key)
+
+def call_model(fn, *args, **kwargs):
+    """Call an OpenAI API function, bounded by the current job's deadlines and cancellable
+
+    Outside a job this is a plain call. Inside one, the request timeout is
+    capped at the time the job has left and the call runs on a helper thread
+    so the job can give up on it as soon as it is cancelled.
+    """
+    video_id = getattr(current_job, "video_id", None)
+    if video_id is None or video_id not in job_controls:
+        return fn(*args, **kwargs)
+    
+    check_job(video_id)
+    if accepts_request_timeout(fn):
+        kwargs.setdefault("request_timeout", max(1, job_time_remaining(video_id)))
+    future = model_call_executor.submit(fn, *args, **kwargs)
+    while True:
+        try:
+            return future.result(timeout=JOB_POLL_INTERVAL)
+        except FuturesTimeoutError:
+            check_job(video_id)
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the peak RSS (kilobytes on Linux/BSD, bytes on macOS)
+        if resource is None:
+            return 0.0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def restart_memory_budget(video_id):
+    """Start charging a job's memory growth afresh from the current RSS"""
+    control = job_controls.get(video_id)
+    if control is None:
+        return
+    control["rss_last"] = current_rss_mb()
+    control["memory_charged"] = 0.0
+    control["memory_attributed"] = 0.0
+    control["memory_exceeded"] = None
+
+def thread_cpu_seconds(thread_id):
+    """CPU time used so far by a thread of this process, or None where /proc is not available"""
+    try:
+        with open(f"/proc/self/task/{thread_id}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def charge_memory_growth(video_id, control, rss, cpu_last):
+    """Charge a job for the RSS growth since its last sample
+
+    Growth counts against the job's budget only while the job is the only
+    one inside a stage. While several are, the job is attributed the share
+    of the growth matching its thread's share of the CPU time the jobs in a
+    stage used since the last sample (an even share without /proc). The
+    process RSS ceiling is the backstop: once it is crossed, the job with
+    the most attributed growth is stopped (or, in the snapshot stage, shrunk).
+    """
+    global memory_process_ceiling
+    with memory_stage_lock:
+        growth = rss - control["rss_last"]
+        control["rss_last"] = rss
+        
+        cpu = {job: thread_cpu_seconds(job_control["thread_id"]) for job, job_control in memory_stage_jobs.items()}
+        used = {job: seconds - cpu_last[job] for job, seconds in cpu.items() if seconds is not None and job in cpu_last}
+        cpu_last.clear()
+        cpu_last.update({job: seconds for job, seconds in cpu.items() if seconds is not None})
+        if len(memory_stage_jobs) <= 1:
+            share = 1.0
+        elif used.get(video_id) is not None and sum(used.values()) > 0:
+            share = used[video_id] / sum(used.values())
+        else:
+            share = 1.0 / len(memory_stage_jobs)
+        control["memory_attributed"] = max(0.0, control["memory_attributed"] + growth * share)
+        
+        if len(memory_stage_jobs) <= 1:
+            control["memory_charged"] = max(0.0, control["memory_charged"] + growth)
+            if control["memory_charged"] > JOB_MEMORY_BUDGET_MB:
+                control["memory_exceeded"] = f"Stage '{control['stage']}' exceeded its memory budget of {JOB_MEMORY_BUDGET_MB:.0f} MB"
+            return
+        
+        if memory_process_ceiling is None or rss <= memory_process_ceiling:
+            return
+        victim_id = max(memory_stage_jobs, key=lambda job: memory_stage_jobs[job]["memory_attributed"])
+        memory_stage_jobs[victim_id]["memory_exceeded"] = f"Stopped to keep process memory under its ceiling of {memory_process_ceiling:.0f} MB"
+        # RSS rarely shrinks, so only fire again after another budget's worth of growth
+        memory_process_ceiling = rss + JOB_MEMORY_BUDGET_MB
+    logger.warning(f"Process RSS {rss:.0f} MB is over its memory ceiling, stopping video {victim_id}")
+
+def memory_profiler_lines():
+    """Line numbers in this file of the memory profiler itself, whose allocations are left out of reports"""
+    global profiler_lines
+    if profiler_lines is None:
+        lines = set()
+        for function in (current_rss_mb, thread_cpu_seconds, charge_memory_growth, top_allocation_sites, memory_sampler,
+                         start_memory_profile, finish_memory_profile):
+            source, first = inspect.getsourcelines(function)
+            lines.update(range(first, first + len(source)))
+        profiler_lines = lines
+    return profiler_lines
+
+def top_allocation_sites(snapshot, start, limit=5):
+    """Allocation sites that grew the most since the start snapshot, leaving out tracemalloc and this profiler"""
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, threading.__file__),
+        tracemalloc.Filter(False, "<unknown>")
+    ]
+    sites = []
+    for stat in snapshot.filter_traces(ignore).compare_to(start.filter_traces(ignore), "lineno"):
+        frame = stat.traceback[0]
+        if stat.size_diff <= 0 or (frame.filename == __file__ and frame.lineno in memory_profiler_lines()):
+            continue
+        sites.append({"location": str(stat.traceback), "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff})
+        if len(sites) == limit:
+            break
+    return sites
+
+def memory_sampler(video_id, profile, stop):
+    """Sample RSS while a stage runs, flagging the job once it goes over its memory budget
+
+    When profiling, a tracemalloc snapshot is also kept each time traced
+    memory reaches a new high, so the allocation sites at the stage's peak
+    can be reported.
+    """
+    control = job_controls.get(video_id)
+    cpu_last = {}
+    while not stop.wait(JOB_MEMORY_SAMPLE_INTERVAL):
+        rss = current_rss_mb()
+        profile["rss_peak_mb"] = max(profile["rss_peak_mb"], rss)
+        if profile["trace_start"] is not None:
+            traced = tracemalloc.get_traced_memory()[0]
+            if traced > profile["traced_at_peak"] * 1.1:
+                profile["peak_snapshot"] = tracemalloc.take_snapshot()
+                profile["traced_at_peak"] = traced
+        if JOB_MEMORY_BUDGET_MB and control is not None:
+            charge_memory_growth(video_id, control, rss, cpu_last)
+
+def start_memory_profile(video_id, stage):
+    """Begin RSS sampling (and, when profiling, allocation tracing) for a pipeline stage"""
+    global memory_process_ceiling
+    restart_memory_budget(video_id)
+    rss = current_rss_mb()
+    control = job_controls.get(video_id)
+    with memory_stage_lock:
+        if control is not None:
+            control["thread_id"] = threading.get_native_id()
+            memory_stage_jobs[video_id] = control
+        if memory_process_ceiling is None and JOB_MEMORY_BUDGET_MB:
+            memory_process_ceiling = JOB_MEMORY_PROCESS_LIMIT_MB or rss + JOB_MEMORY_BUDGET_MB * sum(PIPELINE_WORKERS.values())
+    
+    profile = {
+        "stage": stage,
+        "started": time.monotonic(),
+        "rss_start_mb": rss,
+        "rss_peak_mb": rss,
+        "stop": threading.Event(),
+        "trace_start": None,
+        "peak_snapshot": None
+    }
+    if JOB_MEMORY_PROFILING:
+        # Read the profiler's own source before tracing, so it isn't reported as an allocation
+        memory_profiler_lines()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profile["trace_start"] = tracemalloc.take_snapshot()
+        profile["traced_at_peak"] = tracemalloc.get_traced_memory()[0]
+    
+    threading.Thread(target=memory_sampler, args=(video_id, profile, profile["stop"]), daemon=True).start()
+    return profile
+
+def finish_memory_profile(video_id, profile):
+    """Stop sampling a stage and record its memory use on the job and in the logs"""
+    profile["stop"].set()
+    with memory_stage_lock:
+        memory_stage_jobs.pop(video_id, None)
+    rss = current_rss_mb()
+    entry = {
+        "stage": profile["stage"],
+        "seconds": round(time.monotonic() - profile["started"], 2),
+        "rss_start_mb": round(profile["rss_start_mb"], 1),
+        "rss_end_mb": round(rss, 1),
+        "rss_peak_mb": round(max(profile["rss_peak_mb"], rss), 1)
+    }
+    
+    if profile["trace_start"] is not None:
+        # Tracing is process-wide, so concurrent jobs show up in each other's numbers
+        entry["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        if profile["peak_snapshot"] is not None:
+            entry["top_at_peak"] = top_allocation_sites(profile["peak_snapshot"], profile["trace_start"])
+        entry["top_retained"] = top_allocation_sites(tracemalloc.take_snapshot(), profile["trace_start"])
+    
+    videos_db[video_id].setdefault("memory_profile", []).append(entry)
+    logger.info(
+        f"Memory for video {video_id} stage {entry['stage']}: RSS {entry['rss_start_mb']} -> "
+        f"{entry['rss_end_mb']} MB (peak {entry['rss_peak_mb']} MB)"
+    )
+
+def release_job_resources(video_id):
+    """Drop a finished job's control state and, unless KEEP_UPLOADS is set, its uploaded file"""
+    job_controls.pop(video_id, None)
+    video = videos_db.get(video_id, {})
+    path = video.get("path")
+    # Files ingested from a local path belong to the caller and are never deleted
+    if not KEEP_UPLOADS and not video.get("local_source") and path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Could not remove upload {path}: {str(e)}")
+
+def audio_frame_levels(audio_clip):
+    """Decode an audio track to mono PCM chunk by chunk and return the level of each VAD frame in dBFS"""
+    frame_length = int(VAD_SAMPLE_RATE * VAD_FRAME_SECONDS)
+    levels = []
+    remainder = np.zeros(0, dtype=np.float32)
+    
+    # Chunks must fit in the reader's decode buffer (about 4s at 48kHz)
+    for chunk in audio_clip.iter_chunks(chunk_duration=2, fps=VAD_SAMPLE_RATE):
+        check_current_job()
+        mono = np.concatenate([remainder, chunk.mean(axis=1).astype(np.float32)])
+        usable = len(mono) - len(mono) % frame_length
+        frames = mono[:usable].reshape(-1, frame_length)
+        levels.append(np.sqrt(np.mean(frames * frames, axis=1)))
+        remainder = mono[usable:]
+    
+    if not levels:
+        return np.zeros(0, dtype=np.float32)
+    rms = np.concatenate(levels)
+    return 20 * np.log10(np.maximum(rms, 1e-5))
+
+def detect_speech_regions(levels, frame_seconds=None):
+    """Find the regions of audio worth transcribing from per-frame levels
+
+    Frames louder than the noise floor by VAD_THRESHOLD_DB count as speech.
+    The threshold never goes above VAD_SPEECH_CEILING_DB, so when there is
+    little silence (and the floor is really a speech level) quieter speakers
+    are still kept.
+    Speech is padded by half of VAD_KEEP_SILENCE on each side, and pauses
+    shorter than VAD_MIN_SILENCE are kept, so only long silences are cut
+    (down to VAD_KEEP_SILENCE). Returns a list of (start, end) in seconds.
+    """
+    frame_seconds = frame_seconds or VAD_FRAME_SECONDS
+    if len(levels) == 0:
+        return []
+    
+    noise_floor = np.percentile(levels, 10)
+    threshold = min(max(noise_floor + VAD_THRESHOLD_DB, -60), VAD_SPEECH_CEILING_DB)
+    speech = levels > threshold
+    
+    # Pad speech on both sides
+    pad = int(VAD_KEEP_SILENCE / 2 / frame_seconds)
+    if pad > 0:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode='same') > 0
+    
+    # Fill pauses that are too short to be worth cutting
+    edges = np.diff(np.concatenate([[1], speech.astype(np.int8), [1]]))
+    gap_starts = np.flatnonzero(edges == -1)
+    gap_ends = np.flatnonzero(edges == 1)
+    short = (gap_ends - gap_starts) * frame_seconds < VAD_MIN_SILENCE
+    fill = np.zeros(len(speech) + 1, dtype=np.int32)
+    np.add.at(fill, gap_starts[short], 1)
+    np.add.at(fill, gap_ends[short], -1)
+    speech |= np.cumsum(fill)[:-1] > 0
+    
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1) * frame_seconds
+    ends = np.flatnonzero(edges == -1) * frame_seconds
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def build_offset_map(regions):
+    """Map positions in the trimmed audio back to the original video timeline"""
+    durations = np.array([end - start for start, end in regions])
+    trimmed_starts = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+    original_starts = np.array([start for start, _ in regions])
+    return trimmed_starts, original_starts
+
+def map_to_original_time(t, offset_map):
+    """Convert a timestamp in the trimmed audio to the matching time in the original video"""
+    trimmed_starts, original_starts = offset_map
+    index = max(0, np.searchsorted(trimmed_starts, t, side='right') - 1)
+    return float(original_starts[index] + (t - trimmed_starts[index]))
+
+def write_speech_audio(audio_clip, audio_path):
+    """Write only the speech regions of an audio track, returning the offset map (or None if nothing was cut)"""
+    regions = detect_speech_regions(audio_frame_levels(audio_clip))
+    regions = [(start, min(end, audio_clip.duration)) for start, end in regions if start < audio_clip.duration]
+    kept = sum(end - start for start, end in regions)
+    
+    # Nothing worth cutting (or no speech found at all): keep the full track
+    if kept < 0.5 or kept > audio_clip.duration * 0.95:
+        audio_clip.write_audiofile(audio_path, logger=None)
+        return None
+    
+    logger.info(f"Speech detection kept {kept:.1f}s of {audio_clip.duration:.1f}s audio in {len(regions)} regions")
+    trimmed = concatenate_audioclips([audio_clip.subclip(start, end) for start, end in regions])
+    trimmed.write_audiofile(audio_path, fps=audio_clip.fps, logger=None)
+    return build_offset_map(regions)
 
 def extract_transcript(video_path):
     """Extract transcript from video using OpenAI Whisper API"""
     logger.info(f"Extracting transcript from {video_path}")
     
+    temp_audio_path = None
     try:
         # Extract audio from video
         with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_audio:
             temp_audio_path = temp_audio.name
         
         video_clip = VideoFileClip(video_path)
-        video_clip.audio.write_audiofile(temp_audio_path, logger=None)
-        video_clip.close()
+        try:
+            offset_map = None
+            if VAD_ENABLED:
+                # Drop long silences so less audio is uploaded and transcribed
+                offset_map = write_speech_audio(video_clip.audio, temp_audio_path)
+            else:
+                video_clip.audio.write_audiofile(temp_audio_path, logger=None)
+        finally:
+            video_clip.close()
+        check_current_job()
         
         # Use OpenAI Whisper API to transcribe the audio
         with open(temp_audio_path, "rb") as audio_file:
-            response = openai.Audio.transcribe(
-                "whisper-1",
-                audio_file
+            response = call_model(
+                transcribe_audio,
+                audio_file,
+                response_format="verbose_json"
             )
         
-        # Clean up temporary file
-        os.unlink(temp_audio_path)
-        
-        return response.text
+        # Keep segment timings so search results can jump to a point in the video
+        segments = [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in response.get("segments", [])
+        ]
+        if offset_map is not None:
+            for segment in segments:
+                segment["start"] = map_to_original_time(segment["start"], offset_map)
+                segment["end"] = map_to_original_time(segment["end"], offset_map)
+        return response.text, segments
     
     except Exception as e:
         logger.error(f"Transcript extraction error: {str(e)}")
         raise Exception(f"Transcript extraction failed: {str(e)}")
+    
+    finally:
+        # Clean up temporary file
+        if temp_audio_path and os.path.exists(temp_audio_path):
+            os.unlink(temp_audio_path)
+
+def extract_video_snapshots(video_path, num_snapshots=10, workers=None, size=(800, 600)):
+    """Extract smart snapshots from video at key moments
 
-def extract_video_snapshots(video_path, num_snapshots=10):
-    """Extract smart snapshots from video at key moments"""
+    With workers > 0 (default SNAPSHOT_WORKERS) the video is scanned in
+    parallel time ranges instead of seeking to fixed positions.
+    """
     logger.info(f"Extracting snapshots from {video_path}")
+    workers = SNAPSHOT_WORKERS if workers is None else workers
     
     try:
+        if workers > 0:
+            return extract_video_snapshots_segmented(video_path, num_snapshots, workers, size)
+        
         # Open video with OpenCV
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
@@ -103,6 +668,7 @@ def extract_video_snapshots(video_path, num_snapshots=10):
             time_interval = (end_time - start_time) / (num_snapshots - 1)
             
             for i in range(num_snapshots):
+                check_current_job()
                 target_time = start_time + (i * time_interval)
                 frame_number = int(target_time * fps)
                 
@@ -111,19 +677,15 @@ def extract_video_snapshots(video_path, num_snapshots=10):
                 ret, frame = cap.read()
                 
                 if ret:
-                    # Convert BGR to RGB
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    # Convert to PIL Image
-                    pil_image = Image.fromarray(frame_rgb)
-                    
-                    # Resize to standard size (800x600)
-                    pil_image = pil_image.resize((800, 600), Image.Resampling.LANCZOS)
+                    # Resize to the snapshot size (800x600 by default) and encode straight from
+                    # the BGR frame, so no full-resolution RGB or PIL copies are made
+                    jpeg = encode_snapshot_jpeg(frame, size)
+                    del frame
+                    if not jpeg:
+                        continue
                     
                     # Convert to base64
-                    buffer = io.BytesIO()
-                    pil_image.save(buffer, format='JPEG', quality=85)
-                    img_str = base64.b64encode(buffer.getvalue()).decode()
+                    img_str = base64.b64encode(jpeg).decode()
                     
                     snapshots.append({
                         'timestamp': target_time,
@@ -140,6 +702,154 @@ def extract_video_snapshots(video_path, num_snapshots=10):
         logger.error(f"Error extracting snapshots: {str(e)}")
         return []
 
+def score_snapshot_frame(frame):
+    """Score how informative a frame is: sharp, non-black frames score highest"""
+    small = cv2.resize(frame, (320, 180), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    if gray.mean() < 10:
+        return 0.0
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def encode_snapshot_jpeg(frame, size=(800, 600)):
+    """Resize a BGR frame to the snapshot size and encode it as JPEG bytes"""
+    resized = cv2.resize(frame, size, interpolation=cv2.INTER_LANCZOS4)
+    ok, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buffer.tobytes() if ok else None
+
+def scan_snapshot_range(video_path, slots, sample_step, size=(800, 600)):
+    """Pick the best frame in each of a range of snapshot slots
+
+    Runs in a worker process with its own capture. slots is a list of
+    (slot_index, window_start, window_end); each window is reached with one
+    seek, so only the frames from the nearest keyframe to the end of the
+    window are decoded, and every sample_step-th frame in it is scored.
+    Only compact results come back: (slot_index, frame_number, score,
+    jpeg_bytes) per slot.
+    """
+    cv2.setNumThreads(1)
+    cap = cv2.VideoCapture(video_path)
+    results = []
+    if not cap.isOpened():
+        return results
+    
+    try:
+        for slot_index, window_start, window_end in slots:
+            best_score = -1.0
+            best_frame = None
+            best_number = None
+            
+            cap.set(cv2.CAP_PROP_POS_FRAMES, window_start)
+            for frame_number in range(window_start, window_end):
+                # grab() skips colour conversion; only sampled frames are retrieved
+                if not cap.grab():
+                    break
+                if (frame_number - window_start) % sample_step == 0:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        score = score_snapshot_frame(frame)
+                        if score > best_score:
+                            best_score, best_frame, best_number = score, frame, frame_number
+            
+            if best_frame is not None:
+                jpeg = encode_snapshot_jpeg(best_frame, size)
+                if jpeg:
+                    results.append((slot_index, best_number, best_score, jpeg))
+    finally:
+        cap.release()
+    
+    return results
+
+def scan_snapshot_range_worker(connection, video_path, slots, sample_step, size):
+    """Worker process entry point: send the scan's results, or its error, back over a pipe"""
+    try:
+        connection.send(("ok", scan_snapshot_range(video_path, slots, sample_step, size)))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+def extract_video_snapshots_segmented(video_path, num_snapshots=10, workers=2, size=(800, 600)):
+    """Extract snapshots by scanning the video's snapshot slots in parallel worker processes
+
+    The middle 80% of the video is divided into one slot per snapshot, slots are
+    split into contiguous ranges (one per worker), and each worker seeks to a
+    short window in the middle of each of its slots with its own capture,
+    returning the sharpest sampled frame in the window.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    
+    if total_frames <= 0 or fps <= 0:
+        return []
+    
+    start_frame = int(total_frames * 0.1)
+    end_frame = int(total_frames * 0.9)
+    slot_size = max(1, (end_frame - start_frame) // num_snapshots)
+    window = max(1, min(slot_size, int(round(fps * SNAPSHOT_SAMPLE_WINDOW))))
+    slots = []
+    for i in range(num_snapshots):
+        window_start = start_frame + i * slot_size + (slot_size - window) // 2
+        slots.append((i, window_start, window_start + window))
+    sample_step = max(1, int(round(fps * SNAPSHOT_SAMPLE_INTERVAL)))
+    
+    workers = max(1, min(workers, len(slots)))
+    ranges = [list(chunk) for chunk in np.array_split(np.arange(len(slots)), workers)]
+    ranges = [[slots[i] for i in chunk] for chunk in ranges if chunk]
+    logger.info(f"Scanning {len(slots)} snapshot slots in {len(ranges)} worker processes")
+    
+    results = []
+    context = multiprocessing.get_context("spawn")
+    scans = []
+    try:
+        for chunk in ranges:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=scan_snapshot_range_worker,
+                args=(sender, video_path, chunk, sample_step, size),
+                daemon=True
+            )
+            process.start()
+            sender.close()
+            scans.append((process, receiver))
+        
+        for process, receiver in scans:
+            # poll() also returns once the worker has died and its end of the pipe is closed
+            while not receiver.poll(JOB_POLL_INTERVAL):
+                check_current_job()
+            try:
+                status, value = receiver.recv()
+            except EOFError:
+                process.join(1)
+                raise Exception(f"Snapshot worker exited with code {process.exitcode}")
+            if status == "error":
+                raise Exception(f"Snapshot worker failed: {value}")
+            results.extend(value)
+    finally:
+        # Every scan has finished unless the job was cancelled or a worker failed;
+        # either way stop the decoders now instead of letting each finish its range
+        for process, receiver in scans:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+    
+    snapshots = []
+    for slot_index, frame_number, score, jpeg in sorted(results):
+        timestamp = frame_number / fps
+        snapshots.append({
+            'timestamp': timestamp,
+            'frame_number': frame_number,
+            'image_data': f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode()}",
+            'description': f"Frame at {timestamp:.1f}s"
+        })
+    
+    logger.info(f"Extracted {len(snapshots)} snapshots")
+    return snapshots
+
 def get_smart_snapshot_for_scene(snapshots, scene_index, total_scenes, scene_narration=""):
     """Select the most appropriate snapshot for a scene based on timing and content with randomization"""
     import random
@@ -172,8 +882,13 @@ def get_smart_snapshot_for_scene(snapshots, scene_index, total_scenes, scene_nar
     
     return closest_snapshot
 
-def add_snapshots_to_course(course, snapshots):
-    """Add video snapshots to course scenes as background images"""
+def add_snapshots_to_course(course, snapshots, section_index=None, scene_index=None):
+    """Add video snapshots to course scenes as background images
+
+    When section_index (and optionally scene_index) is given, only that part of
+    the course is touched; snapshot choice still uses the scene's position in
+    the whole course.
+    """
     if not snapshots:
         return course
     
@@ -186,13 +901,19 @@ def add_snapshots_to_course(course, snapshots):
         return course
     
     # Add snapshots to each scene
-    scene_index = 0
-    for section in course.get('sections', []):
-        for scene in section.get('scenes', []):
+    course_scene_index = 0
+    for current_section, section in enumerate(course.get('sections', [])):
+        for current_scene, scene in enumerate(section.get('scenes', [])):
+            if section_index is not None and (
+                    current_section != section_index
+                    or (scene_index is not None and current_scene != scene_index)):
+                course_scene_index += 1
+                continue
+            
             # Get appropriate snapshot for this scene
             snapshot = get_smart_snapshot_for_scene(
                 snapshots, 
-                scene_index, 
+                course_scene_index, 
                 total_scenes, 
                 scene.get('narration', '')
             )
@@ -229,7 +950,7 @@ def add_snapshots_to_course(course, snapshots):
                     'description': snapshot['description']
                 }
             
-            scene_index += 1
+            course_scene_index += 1
     
     return course
 
@@ -415,6 +1136,264 @@ def generate_smart_elements_for_scene(scene, snapshot):
     
     return elements
 
+def repair_json_text(text):
+    """Make a possibly truncated JSON document loadable in a single pass.
+
+    Drops trailing commas, ignores anything after the top-level value and,
+    if the text stops mid-document, cuts back to the last complete value and
+    closes the open brackets. Returns the repaired text and whether the
+    input was truncated. Cheap enough to run on every chunk of streamed output.
+    """
+    out = []
+    stack = []
+    expect_key = []
+    in_string = False
+    escape = False
+    string_is_key = False
+    safe_len = 0
+    safe_stack = []
+    
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if not string_is_key:
+                    safe_len, safe_stack = len(out), list(stack)
+            continue
+        
+        if ch == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == '{' and expect_key[-1]
+            out.append(ch)
+        elif ch in '{[':
+            stack.append(ch)
+            expect_key.append(ch == '{')
+            out.append(ch)
+            safe_len, safe_stack = len(out), list(stack)
+        elif ch in '}]':
+            if not stack:
+                break
+            # Drop a trailing comma before the closing bracket
+            i = len(out) - 1
+            while i >= 0 and out[i].isspace():
+                i -= 1
+            if i >= 0 and out[i] == ',':
+                del out[i]
+            opener = stack.pop()
+            expect_key.pop()
+            out.append('}' if opener == '{' else ']')
+            safe_len, safe_stack = len(out), list(stack)
+            if not stack:
+                break
+        elif ch == ',':
+            safe_len, safe_stack = len(out), list(stack)
+            if stack and stack[-1] == '{':
+                expect_key[-1] = True
+            out.append(ch)
+        elif ch == ':':
+            if stack and stack[-1] == '{':
+                expect_key[-1] = False
+            out.append(ch)
+        else:
+            out.append(ch)
+    
+    if not stack and not in_string:
+        return ''.join(out), False
+    
+    # Truncated: keep everything up to the last complete value and close it off
+    repaired = ''.join(out[:safe_len]).rstrip()
+    if repaired.endswith(','):
+        repaired = repaired[:-1]
+    for opener in reversed(safe_stack):
+        repaired += '}' if opener == '{' else ']'
+    return repaired, True
+
+def find_matching_brace(text, start):
+    """Return the index of the brace closing the object that opens at start, or None"""
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+def parse_json_lenient(text):
+    """Parse the first JSON object in model output, repairing it if needed.
+
+    Returns the parsed object and whether the output was truncated.
+    """
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    text = text[start:]
+    
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text)
+        return value, False
+    except json.JSONDecodeError:
+        pass
+    
+    repaired, truncated = repair_json_text(text)
+    return json.loads(repaired), truncated
+
+def salvage_course_json(text):
+    """Recover the top-level fields and every complete section from malformed course output"""
+    decoder = json.JSONDecoder()
+    course = {}
+    truncated = False
+    
+    sections_match = re.search(r'"sections"\s*:\s*\[', text)
+    header = text[:sections_match.start()] if sections_match else text
+    for key in ('title', 'description'):
+        match = re.search(r'"%s"\s*:\s*' % key, header)
+        if match:
+            try:
+                value, _ = decoder.raw_decode(header, match.end())
+                if isinstance(value, str):
+                    course[key] = value
+            except json.JSONDecodeError:
+                pass
+    
+    sections = []
+    if sections_match:
+        pos = sections_match.end()
+        while True:
+            if pos >= len(text):
+                truncated = True
+                break
+            ch = text[pos]
+            if ch.isspace() or ch == ',':
+                pos += 1
+                continue
+            if ch == ']':
+                break
+            if ch != '{':
+                # Stray prose between sections: skip ahead to the next one,
+                # unless the array closes first
+                next_object = text.find('{', pos)
+                array_end = text.find(']', pos)
+                if array_end != -1 and (next_object == -1 or array_end < next_object):
+                    break
+                if next_object == -1:
+                    truncated = True
+                    break
+                pos = next_object
+                continue
+            
+            try:
+                section, pos = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                end = find_matching_brace(text, pos)
+                if end is None:
+                    # Cut off mid-section: keep whatever part of it is complete
+                    try:
+                        section = json.loads(repair_json_text(text[pos:])[0])
+                    except json.JSONDecodeError:
+                        section = None
+                    if isinstance(section, dict):
+                        sections.append(section)
+                    truncated = True
+                    break
+                try:
+                    section = json.loads(repair_json_text(text[pos:end + 1])[0])
+                except json.JSONDecodeError:
+                    # Keep the slot so the section is regenerated in place
+                    section = {}
+                pos = end + 1
+            sections.append(section)
+    
+    metadata_at = text.rfind('"metadata"')
+    if metadata_at != -1:
+        match = re.compile(r'"metadata"\s*:\s*').match(text, metadata_at)
+        if match:
+            try:
+                metadata = json.loads(repair_json_text(text[match.end():])[0])
+                if isinstance(metadata, dict):
+                    course['metadata'] = metadata
+            except json.JSONDecodeError:
+                pass
+    
+    course['sections'] = sections
+    return course, truncated
+
+def sections_truncated(text):
+    """Whether model output stops before its sections array is closed"""
+    match = re.search(r'"sections"\s*:\s*\[', text)
+    return match is None or find_matching_brace(text, match.end() - 1) is None
+
+def parse_course_json(text):
+    """Parse course JSON from the model, salvaging complete sections from defective output.
+
+    Returns the course and whether sections are missing from the end of it.
+    Output cut off after the sections array (e.g. inside "metadata") has
+    every section, so it doesn't count as truncated.
+    """
+    try:
+        course, truncated = parse_json_lenient(text)
+        if isinstance(course, dict) and isinstance(course.get('sections', []), list):
+            course.setdefault('sections', [])
+            return course, truncated and sections_truncated(text)
+    except ValueError:
+        pass
+    
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    logger.warning("Course JSON is malformed, salvaging complete sections")
+    return salvage_course_json(text[start:])
+
+def validate_course_section(section):
+    """Check a generated section against the course schema, returning a list of problems"""
+    if not isinstance(section, dict):
+        return ["section is not an object"]
+    
+    problems = []
+    if not isinstance(section.get('title'), str) or not section['title'].strip():
+        problems.append("missing title")
+    
+    section_type = section.get('type') or ('quiz' if section.get('questions') else 'content')
+    if section_type == 'quiz':
+        questions = section.get('questions')
+        if not isinstance(questions, list) or not questions:
+            problems.append("quiz has no questions")
+        else:
+            for i, question in enumerate(questions):
+                if (not isinstance(question, dict)
+                        or not question.get('question')
+                        or not isinstance(question.get('options'), dict)
+                        or question.get('correct_answer') not in question['options']):
+                    problems.append(f"question {i} is incomplete")
+    else:
+        scenes = section.get('scenes')
+        if not isinstance(scenes, list) or not scenes:
+            problems.append("section has no scenes")
+        else:
+            for i, scene in enumerate(scenes):
+                if not isinstance(scene, dict) or not isinstance(scene.get('narration'), str) or not scene['narration'].strip():
+                    problems.append(f"scene {i} has no narration")
+    
+    return problems
+
 def generate_course(transcript, video_title, mode="full"):
     """Generate a course structure from the transcript using OpenAI with scenes and visual elements"""
     logger.info("Generating course from transcript with scenes and visual elements")
@@ -422,20 +1401,9 @@ def generate_course(transcript, video_title, mode="full"):
     try:
         # Use OpenAI to structure the transcript into a course with scenes
         # Tailor style guidelines based on mode
-        if mode == "concise":
-            style_instructions = (
-                "Aim for brevity: 3-4 sections, 1-2 scenes per section, "
-                "short bullet text, minimal visual elements per scene. Generate at most 1 quiz section with 3 questions."
-            )
-        else:
-            style_instructions = (
-                "Fully fledged comprehensive course: Create 6-8 detailed sections with 3-5 scenes each. "
-                "Each scene should have rich, detailed narration (2-4 sentences). "
-                "Include quiz sections after every 2-3 content sections with 4-5 questions each. "
-                "Ensure the course covers the entire transcript content thoroughly with proper learning progression."
-            )
+        style_instructions = course_style_instructions(mode)
 
-        response = openai.ChatCompletion.create(
+        response = call_model(openai.ChatCompletion.create,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": """
@@ -525,20 +1493,15 @@ def generate_course(transcript, video_title, mode="full"):
         
         course_data = response.choices[0].message['content']
         
-        # Parse the JSON response
-        try:
-            course = json.loads(course_data)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}")
-            logger.error(f"Received data: {course_data}")
-            # Try to clean the response and parse again
-            cleaned_data = course_data.strip()
-            if cleaned_data.startswith('```json'):
-                cleaned_data = cleaned_data[7:]
-            if cleaned_data.endswith('```'):
-                cleaned_data = cleaned_data[:-3]
-            cleaned_data = cleaned_data.strip()
-            course = json.loads(cleaned_data)
+        # Parse the JSON response, keeping every complete section even if the output is defective
+        course, truncated = parse_course_json(course_data)
+        if response.choices[0].get('finish_reason') == 'length':
+            truncated = True
+        if truncated:
+            logger.warning(f"Course output was truncated after {len(course['sections'])} sections")
+        
+        # Regenerate only the sections that are missing or invalid
+        course = repair_course_sections(course, transcript, video_title, mode, truncated)
         
         return course
     
@@ -546,47 +1509,740 @@ def generate_course(transcript, video_title, mode="full"):
         logger.error(f"Course generation error: {str(e)}")
         raise Exception(f"Course generation failed: {str(e)}")
 
+def course_style_instructions(mode):
+    """Style guidance for the course generation prompts"""
+    if mode == "concise":
+        return (
+            "Aim for brevity: 3-4 sections, 1-2 scenes per section, "
+            "short bullet text, minimal visual elements per scene. Generate at most 1 quiz section with 3 questions."
+        )
+    return (
+        "Fully fledged comprehensive course: Create 6-8 detailed sections with 3-5 scenes each. "
+        "Each scene should have rich, detailed narration (2-4 sentences). "
+        "Include quiz sections after every 2-3 content sections with 4-5 questions each. "
+        "Ensure the course covers the entire transcript content thoroughly with proper learning progression."
+    )
+
+COURSE_SECTION_FORMAT = """
+{
+    "title": "Section Title",
+    "type": "content|quiz",
+    "duration": "Estimated duration",
+    "scenes": [
+        {
+            "scene_type": "introduction|content|summary",
+            "narration": "Text to be narrated for this scene"
+        }
+    ],
+    "blocks": [
+        { "type": "text", "content": "Short paragraph" }
+    ],
+    "questions": [
+        {
+            "question": "Question text here",
+            "options": {"A": "Option A text", "B": "Option B text", "C": "Option C text", "D": "Option D text"},
+            "correct_answer": "A|B|C|D",
+            "explanation": "Explanation of why this answer is correct"
+        }
+    ]
+}
+"""
+
+def course_outline(course):
+    """Numbered list of section titles used as context when regenerating sections"""
+    return "\n".join(
+        f"{i + 1}. [{section.get('type', 'content')}] {section.get('title', 'Untitled')}"
+        for i, section in enumerate(course.get('sections', []))
+        if isinstance(section, dict)
+    )
+
+def generate_course_section(transcript, course, section_index, mode="full", section_type=None, instructions=None):
+    """Regenerate a single section of a course with one small model call"""
+    logger.info(f"Regenerating section {section_index}")
+    
+    sections = course.get('sections', [])
+    existing = sections[section_index] if section_index < len(sections) else {}
+    if not section_type:
+        section_type = existing.get('type') if isinstance(existing, dict) else None
+    type_hint = f'The section must have "type": "{section_type}".' if section_type else ""
+    
+    current = section_text(existing) if isinstance(existing, dict) else ""
+    extra_context = f"\n\nCurrent version of the section:\n{current}" if current else ""
+    if instructions:
+        extra_context += f"\n\nEditor instructions: {instructions}"
+    
+    response = call_model(openai.ChatCompletion.create,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": f"""
+            You are a course creation expert. You are rewriting one section of an existing course generated from a video transcript.
+            Write section number {section_index + 1} so that it fits between its neighbours in the outline and covers its part of the transcript.
+            If a current version is given, produce a better one and follow any editor instructions.
+            {type_hint}
+            Content sections need scenes with rich narration (2-4 sentences each). Quiz sections need questions with 4 options (A, B, C, D), one correct answer and an explanation.
+            Style guidance: {course_style_instructions(mode)}
+            
+            Respond with ONLY a single JSON object for the section, with this structure:
+            {COURSE_SECTION_FORMAT}
+            """},
+            {"role": "user", "content": f"Course title: {course.get('title', '')}\n\nOutline:\n{course_outline(course)}{extra_context}\n\nTranscript: {transcript}"}
+        ]
+    )
+    
+    section, _ = parse_json_lenient(response.choices[0].message['content'])
+    problems = validate_course_section(section)
+    if problems:
+        raise Exception(f"Regenerated section is invalid: {'; '.join(problems)}")
+    return section
+
+def generate_remaining_sections(transcript, video_title, course, mode="full"):
+    """Generate the sections missing from the end of a truncated course"""
+    logger.info(f"Generating sections after section {len(course.get('sections', []))}")
+    
+    response = call_model(openai.ChatCompletion.create,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": f"""
+            You are a course creation expert. A course generated from a video transcript was cut off part-way through.
+            Given the outline of the sections that already exist, write ONLY the remaining sections needed to cover the rest of the transcript.
+            Do not repeat existing sections. Include quiz sections where the style guidance calls for them.
+            Style guidance: {course_style_instructions(mode)}
+            
+            Respond with ONLY a JSON object of the form {{"sections": [ ... ]}} where each section has this structure:
+            {COURSE_SECTION_FORMAT}
+            """},
+            {"role": "user", "content": f"Video Title: {video_title}\n\nExisting outline:\n{course_outline(course)}\n\nTranscript: {transcript}"}
+        ]
+    )
+    
+    content = response.choices[0].message['content']
+    result, _ = parse_course_json(content)
+    return [section for section in result.get('sections', []) if not validate_course_section(section)]
+
+def section_text(section):
+    """Plain text of a section's title, narration and questions, without visual data"""
+    parts = [section.get('title', '')]
+    for scene in section.get('scenes') or []:
+        if isinstance(scene, dict):
+            parts.append(scene.get('narration', ''))
+    for question in section.get('questions') or []:
+        if isinstance(question, dict):
+            parts.append(question.get('question', ''))
+            options = question.get('options')
+            if isinstance(options, dict):
+                parts.extend(f"{key}: {value}" for key, value in options.items())
+    return "\n".join(part for part in parts if isinstance(part, str) and part)
+
+def content_words(text):
+    """Distinctive lowercase words used to match course text against the transcript"""
+    return set(re.findall(r"[a-z']{5,}", text.lower()))
+
+def transcript_span(transcript, course, section_index, scene_index=None):
+    """Return the part of the transcript a section (or one of its scenes) covers
+
+    The transcript is split into fixed-size word chunks and the chunks sharing
+    the most vocabulary with the existing section text are kept, plus one
+    chunk of context either side. Without usable text the span is estimated
+    from the section's position in the course.
+    """
+    words = transcript.split()
+    if len(words) <= TRANSCRIPT_CHUNK_WORDS * 3:
+        return transcript
+    chunks = [words[i:i + TRANSCRIPT_CHUNK_WORDS] for i in range(0, len(words), TRANSCRIPT_CHUNK_WORDS)]
+    
+    sections = course.get('sections', [])
+    section = sections[section_index]
+    if scene_index is not None:
+        text = section['scenes'][scene_index].get('narration', '')
+    else:
+        text = section_text(section)
+        if section.get('type') == 'quiz':
+            # A quiz covers the content sections since the previous quiz
+            for previous in reversed(sections[:section_index]):
+                if previous.get('type') == 'quiz':
+                    break
+                text += "\n" + section_text(previous)
+    
+    key_words = content_words(text)
+    scores = [len(key_words & content_words(' '.join(chunk))) for chunk in chunks]
+    best = max(scores)
+    if best > 0:
+        selected = [i for i, score in enumerate(scores) if score >= best * 0.5]
+        first, last = min(selected) - 1, max(selected) + 1
+        # Common vocabulary can match everywhere; stay close to the best chunk then
+        if last - first + 1 > max(3, len(chunks) // 2):
+            peak = scores.index(best)
+            first, last = peak - 1, peak + 1
+    else:
+        first = int(section_index / len(sections) * len(chunks)) - 1
+        last = int((section_index + 1) / len(sections) * len(chunks))
+    
+    first = max(0, first)
+    last = min(len(chunks) - 1, last)
+    return ' '.join(' '.join(chunk) for chunk in chunks[first:last + 1])
+
+def generate_course_scene(transcript, course, section_index, scene_index, mode="full", instructions=None):
+    """Regenerate the narration of a single scene with one small model call"""
+    logger.info(f"Regenerating scene {scene_index} of section {section_index}")
+    
+    section = course['sections'][section_index]
+    current = section['scenes'][scene_index].get('narration', '')
+    neighbours = "\n".join(
+        f"Scene {i + 1}: {scene.get('narration', '')}"
+        for i, scene in enumerate(section.get('scenes', []))
+        if i != scene_index
+    )
+    extra_context = f"\n\nEditor instructions: {instructions}" if instructions else ""
+    
+    response = call_model(openai.ChatCompletion.create,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": f"""
+            You are a course creation expert. You are rewriting one scene of a course section generated from a video transcript.
+            Write a better version of scene {scene_index + 1} that fits with the other scenes of the section and follows any editor instructions.
+            Style guidance: {course_style_instructions(mode)}
+            
+            Respond with ONLY a JSON object of the form:
+            {{"scene_type": "introduction|content|summary", "narration": "Text to be narrated for this scene"}}
+            """},
+            {"role": "user", "content": f"Section: {section.get('title', 'Untitled')}\n\nOther scenes:\n{neighbours}\n\nCurrent scene: {current}{extra_context}\n\nTranscript: {transcript}"}
+        ]
+    )
+    
+    scene, _ = parse_json_lenient(response.choices[0].message['content'])
+    if not isinstance(scene.get('narration'), str) or not scene['narration'].strip():
+        raise Exception("Regenerated scene has no narration")
+    return scene
+
+def generate_quiz_question(transcript, course, section_index, question_index, instructions=None):
+    """Regenerate a single quiz question with one small model call"""
+    logger.info(f"Regenerating question {question_index} of section {section_index}")
+    
+    section = course['sections'][section_index]
+    others = "\n".join(
+        f"- {question.get('question', '')}"
+        for i, question in enumerate(section.get('questions', []))
+        if i != question_index
+    )
+    current = section['questions'][question_index].get('question', '')
+    extra_context = f"\n\nEditor instructions: {instructions}" if instructions else ""
+    
+    response = call_model(openai.ChatCompletion.create,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": """
+            You are a course creation expert. Write one replacement multiple choice question for a quiz that tests the transcript content.
+            It must not duplicate the other questions of the quiz. Make it challenging but fair, and follow any editor instructions.
+            
+            Respond with ONLY a JSON object of the form:
+            {
+                "question": "Question text here",
+                "options": {"A": "Option A text", "B": "Option B text", "C": "Option C text", "D": "Option D text"},
+                "correct_answer": "A|B|C|D",
+                "explanation": "Explanation of why this answer is correct"
+            }
+            """},
+            {"role": "user", "content": f"Quiz: {section.get('title', 'Quiz')}\n\nOther questions:\n{others}\n\nCurrent question: {current}{extra_context}\n\nTranscript: {transcript}"}
+        ]
+    )
+    
+    question, _ = parse_json_lenient(response.choices[0].message['content'])
+    if validate_course_section({"title": "quiz", "type": "quiz", "questions": [question]}):
+        raise Exception("Regenerated question is incomplete")
+    return question
+
+def repair_course_sections(course, transcript, video_title, mode="full", truncated=False):
+    """Regenerate invalid sections in place and, if the output was cut off, the missing tail"""
+    sections = course.setdefault('sections', [])
+    
+    for index, section in enumerate(sections):
+        problems = validate_course_section(section)
+        if not problems:
+            continue
+        logger.warning(f"Section {index} is invalid ({'; '.join(problems)}), regenerating it")
+        try:
+            sections[index] = generate_course_section(transcript, course, index, mode)
+        except Exception as e:
+            logger.error(f"Section {index} regeneration error: {str(e)}")
+    
+    if truncated or not sections:
+        try:
+            sections.extend(generate_remaining_sections(transcript, video_title, course, mode))
+        except Exception as e:
+            logger.error(f"Remaining sections generation error: {str(e)}")
+    
+    course['sections'] = [section for section in sections if not validate_course_section(section)]
+    if not course['sections']:
+        raise Exception("No valid sections could be generated")
+    
+    course.setdefault('title', video_title)
+    course.setdefault('description', '')
+    return course
+
+def init_search_index():
+    """Create the full-text search tables if they do not exist yet"""
+    with search_lock:
+        search_db.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED,
+                video_id UNINDEXED,
+                course_id UNINDEXED,
+                section_index UNINDEXED,
+                scene_index UNINDEXED,
+                start_time UNINDEXED,
+                title,
+                body,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            );
+            CREATE TABLE IF NOT EXISTS course_catalog (
+                course_id TEXT PRIMARY KEY,
+                video_id TEXT,
+                title TEXT,
+                description TEXT,
+                scene_count INTEGER,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS course_catalog_updated ON course_catalog (updated_at DESC);
+            CREATE TABLE IF NOT EXISTS search_rows (
+                row_id INTEGER PRIMARY KEY,
+                owner_kind TEXT NOT NULL,
+                owner_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS search_rows_owner ON search_rows (owner_kind, owner_id);
+        """)
+        # Indexes built before search_rows existed: record which course or video owns each row
+        if search_db.execute("SELECT COUNT(*) FROM search_rows").fetchone()[0] == 0:
+            search_db.execute("""
+                INSERT INTO search_rows
+                SELECT rowid,
+                       CASE kind WHEN 'transcript' THEN 'transcript' ELSE 'course' END,
+                       CASE kind WHEN 'transcript' THEN video_id ELSE course_id END
+                FROM search_index
+            """)
+        search_db.commit()
+
+def replace_indexed_rows(owner_kind, owner_id, rows):
+    """Replace the search rows of a course or a video's transcript; call with search_lock held
+
+    The owner columns of search_index are UNINDEXED, so rows are found
+    through search_rows and deleted by rowid rather than by scanning.
+    """
+    row_ids = search_db.execute(
+        "SELECT row_id FROM search_rows WHERE owner_kind = ? AND owner_id = ?", (owner_kind, owner_id)
+    ).fetchall()
+    search_db.executemany("DELETE FROM search_index WHERE rowid = ?", row_ids)
+    search_db.execute("DELETE FROM search_rows WHERE owner_kind = ? AND owner_id = ?", (owner_kind, owner_id))
+    for row in rows:
+        row_id = search_db.execute("INSERT INTO search_index VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+        search_db.execute("INSERT INTO search_rows VALUES (?, ?, ?)", (row_id, owner_kind, owner_id))
+
+def transcript_chunks(transcript, segments=None):
+    """Split a transcript into search-sized chunks, keeping each chunk's start time when known"""
+    chunks = []
+    if segments:
+        words = []
+        start_time = None
+        for segment in segments:
+            if start_time is None:
+                start_time = segment.get('start')
+            words.extend(segment.get('text', '').split())
+            if len(words) >= TRANSCRIPT_CHUNK_WORDS:
+                chunks.append((start_time, ' '.join(words)))
+                words = []
+                start_time = None
+        if words:
+            chunks.append((start_time, ' '.join(words)))
+    else:
+        words = transcript.split()
+        for i in range(0, len(words), TRANSCRIPT_CHUNK_WORDS):
+            chunks.append((None, ' '.join(words[i:i + TRANSCRIPT_CHUNK_WORDS])))
+    return chunks
+
+def index_transcript(video_id, title, transcript, segments=None):
+    """Add a video's transcript to the search index"""
+    rows = [
+        ('transcript', video_id, None, None, None, start_time, title, text)
+        for start_time, text in transcript_chunks(transcript, segments)
+    ]
+    with search_lock:
+        replace_indexed_rows('transcript', video_id, rows)
+        search_db.commit()
+
+def index_course(course_id, course, video_id=None):
+    """Add or refresh a course's title, description and scene narrations in the search index"""
+    rows = [('course', video_id, course_id, None, None, None, course.get('title', ''), course.get('description', ''))]
+    scene_count = 0
+    for section_index, section in enumerate(course.get('sections', [])):
+        if not isinstance(section, dict):
+            continue
+        if section.get('type') == 'quiz':
+            rows.append(('quiz', video_id, course_id, section_index, None, None,
+                         section.get('title', ''), section_text(section)))
+        for scene_index, scene in enumerate(section.get('scenes') or []):
+            if not isinstance(scene, dict):
+                continue
+            scene_count += 1
+            start_time = (scene.get('video_snapshot') or {}).get('timestamp')
+            rows.append(('scene', video_id, course_id, section_index, scene_index, start_time,
+                         section.get('title', ''), scene.get('narration', '')))
+    
+    with search_lock:
+        replace_indexed_rows('course', course_id, rows)
+        search_db.execute(
+            "INSERT OR REPLACE INTO course_catalog VALUES (?, ?, ?, ?, ?, ?)",
+            (course_id, video_id, course.get('title', ''), course.get('description', ''), scene_count, time.time())
+        )
+        search_db.commit()
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    terms = ['"%s"' % term.replace('"', '""') for term in text.split()]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def search_index_query(text, kind=None, limit=20, offset=0):
+    """Ranked full-text search over transcripts and courses, with highlighted snippets"""
+    query = fts_query(text)
+    if not query:
+        return [], False
+    
+    sql = """
+        SELECT kind, video_id, course_id, section_index, scene_index, start_time, title,
+               snippet(search_index, 7, '<mark>', '</mark>', '...', 16), bm25(search_index)
+        FROM search_index
+        WHERE search_index MATCH ?
+    """
+    params = [query]
+    if kind:
+        sql += " AND kind = ?"
+        params.append(kind)
+    sql += " ORDER BY bm25(search_index) LIMIT ? OFFSET ?"
+    params.extend([limit + 1, offset])
+    
+    with search_lock:
+        rows = search_db.execute(sql, params).fetchall()
+    
+    results = [{
+        "type": row[0],
+        "video_id": row[1],
+        "course_id": row[2],
+        "section_index": row[3],
+        "scene_index": row[4],
+        "start_time": row[5],
+        "title": row[6],
+        "snippet": row[7],
+        "score": -row[8]
+    } for row in rows[:limit]]
+    return results, len(rows) > limit
+
+def list_catalog_courses(limit=20, offset=0):
+    """Page through indexed courses, most recently updated first"""
+    with search_lock:
+        total = search_db.execute("SELECT COUNT(*) FROM course_catalog").fetchone()[0]
+        rows = search_db.execute(
+            "SELECT course_id, video_id, title, description, scene_count, updated_at "
+            "FROM course_catalog ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    
+    courses = [{
+        "course_id": row[0],
+        "video_id": row[1],
+        "title": row[2],
+        "description": row[3],
+        "scene_count": row[4],
+        "updated_at": row[5]
+    } for row in rows]
+    return courses, total
+
+init_search_index()
+
+def transcript_stage(video_id):
+    """Pipeline stage: extract the transcript (audio extraction and Whisper)"""
+    videos_db[video_id]["status"] = "processing"
+    transcript, segments = extract_transcript(videos_db[video_id]["path"])
+    logger.info(f"Transcript: {transcript}")
+    videos_db[video_id]["transcript"] = transcript
+    videos_db[video_id]["transcript_segments"] = segments
+    videos_db[video_id]["status"] = "transcript_extracted"
+
+def snapshot_stage(video_id):
+    """Pipeline stage: decode the video and extract snapshots
+
+    If extraction goes over the memory budget it is retried once with fewer,
+    smaller snapshots before the job is stopped.
+    """
+    logger.info("Extracting video snapshots...")
+    try:
+        snapshots = extract_video_snapshots(videos_db[video_id]["path"], num_snapshots=15)
+    except JobCancelled as e:
+        if e.status != "memory_exceeded":
+            raise
+        logger.warning(f"Snapshot extraction for video {video_id} went over its memory budget, retrying with fewer snapshots")
+        gc.collect()
+        restart_memory_budget(video_id)
+        snapshots = extract_video_snapshots(
+            videos_db[video_id]["path"],
+            num_snapshots=SNAPSHOT_REDUCED_COUNT,
+            size=SNAPSHOT_REDUCED_SIZE
+        )
+        videos_db[video_id]["snapshots_reduced"] = True
+    videos_db[video_id]["snapshots"] = snapshots
+    videos_db[video_id]["status"] = "snapshots_extracted"
+    logger.info(f"Extracted {len(snapshots)} snapshots")
+
+def course_stage(video_id):
+    """Pipeline stage: generate the course, add snapshots and index it"""
+    video = videos_db[video_id]
+    mode = video.get("mode", "full")
+    course = generate_course(video["transcript"], video["title"], mode)
+    
+    # Add video snapshots to scenes
+    course = add_snapshots_to_course(course, video.get("snapshots", []))
+    check_job(video_id)
+    
+    course_id = str(uuid.uuid4())
+    courses_db[course_id] = course
+    course_videos[course_id] = video_id
+    
+    # Update video record with course ID
+    video["course_id"] = course_id
+    video["status"] = "completed"
+    
+    # Make the transcript and course searchable
+    try:
+        index_transcript(video_id, video["title"], video["transcript"], video.get("transcript_segments"))
+        index_course(course_id, course, video_id)
+    except sqlite3.Error as e:
+        logger.error(f"Search indexing error for video {video_id}: {str(e)}")
+
+PIPELINE_STAGES = [
+    ("transcript", transcript_stage),
+    ("snapshots", snapshot_stage),
+    ("course", course_stage),
+]
+
+def run_stage(video_id, stage_index):
+    """Run one pipeline stage of a job on this thread; returns True if the job has more stages to run"""
+    stage, stage_function = PIPELINE_STAGES[stage_index]
+    finished = True
+    profile = None
+    current_job.video_id = video_id
+    try:
+        if JOB_MEMORY_PROFILING or JOB_MEMORY_BUDGET_MB:
+            profile = start_memory_profile(video_id, stage)
+        start_stage(video_id, stage)
+        stage_function(video_id)
+        end_stage(video_id)
+        finished = stage_index == len(PIPELINE_STAGES) - 1
+    
+    except JobCancelled as e:
+        logger.warning(f"Stopped processing video {video_id}: {str(e)}")
+        videos_db[video_id]["status"] = e.status
+        videos_db[video_id]["error"] = str(e)
+        # Drop partial results
+        videos_db[video_id]["transcript"] = None
+        videos_db[video_id].pop("transcript_segments", None)
+        videos_db[video_id].pop("snapshots", None)
+    
+    except Exception as e:
+        logger.error(f"Error processing video {video_id}: {str(e)}")
+        videos_db[video_id]["status"] = "error"
+        videos_db[video_id]["error"] = str(e)
+    
+    finally:
+        current_job.video_id = None
+        # Release the stage's large intermediates (decoder buffers, frames) before the next stage
+        gc.collect()
+        if profile is not None:
+            finish_memory_profile(video_id, profile)
+        if finished:
+            release_job_resources(video_id)
+    
+    return not finished
+
 def process_video(video_id):
     """Process the uploaded video: extract transcript, snapshots, and generate course"""
     if video_id not in videos_db:
         logger.error(f"Video ID {video_id} not found")
         return
     
+    for stage_index in range(len(PIPELINE_STAGES)):
+        if not run_stage(video_id, stage_index):
+            break
+
+def process_uploaded_video(video_id):
+    """Record a single upload's content hash for batch de-duplication, then process it"""
     try:
-        # Update status
-        videos_db[video_id]["status"] = "processing"
-        
-        # Extract transcript
-        transcript = extract_transcript(videos_db[video_id]["path"])
-        logger.info(f"Transcript: {transcript}")
-        videos_db[video_id]["transcript"] = transcript
-        videos_db[video_id]["status"] = "transcript_extracted"
-        
-        # Extract video snapshots
-        logger.info("Extracting video snapshots...")
-        snapshots = extract_video_snapshots(videos_db[video_id]["path"], num_snapshots=15)
-        videos_db[video_id]["snapshots"] = snapshots
-        videos_db[video_id]["status"] = "snapshots_extracted"
-        logger.info(f"Extracted {len(snapshots)} snapshots")
-        
-        # Generate course
-        mode = videos_db[video_id].get("mode", "full")
-        course = generate_course(transcript, videos_db[video_id]["title"], mode)
-        
-        # Add video snapshots to scenes
-        course = add_snapshots_to_course(course, snapshots)
-        
-        course_id = str(uuid.uuid4())
-        courses_db[course_id] = course
+        video_hashes.setdefault(file_content_hash(videos_db[video_id]["path"]), video_id)
+    except OSError as e:
+        logger.error(f"Could not hash upload for video {video_id}: {str(e)}")
+    process_video(video_id)
+
+def enqueue_pipeline_item(stage_index, batch_id, video_id):
+    """Queue a batch item for a pipeline stage"""
+    with pipeline_condition:
+        pipeline_queues[stage_index].setdefault(batch_id, deque()).append(video_id)
+        pipeline_condition.notify_all()
+
+def next_pipeline_item(stage_index):
+    """Wait for the next item of a stage, rotating between batches so each gets a fair share"""
+    with pipeline_condition:
+        queues = pipeline_queues[stage_index]
+        while not queues:
+            pipeline_condition.wait()
+        batch_id = next(iter(queues))
+        items = queues.pop(batch_id)
+        video_id = items.popleft()
+        if items:
+            # Move the batch to the back of the rotation
+            queues[batch_id] = items
+        return batch_id, video_id
+
+def pipeline_worker(stage_index):
+    """Run one stage for queued batch items forever, passing each on to the next stage"""
+    while True:
+        batch_id, video_id = next_pipeline_item(stage_index)
+        if run_stage(video_id, stage_index):
+            enqueue_pipeline_item(stage_index + 1, batch_id, video_id)
+
+def start_pipeline_workers():
+    """Start the shared stage worker threads the first time a batch is ingested"""
+    global pipeline_started
+    with pipeline_condition:
+        if pipeline_started:
+            return
+        pipeline_started = True
+    
+    for stage_index, (stage, _) in enumerate(PIPELINE_STAGES):
+        for _ in range(PIPELINE_WORKERS[stage]):
+            threading.Thread(target=pipeline_worker, args=(stage_index,), daemon=True).start()
+
+def file_content_hash(path):
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_duplicate_video(content_hash):
+    """Return the ID of an earlier video with the same content that has not failed, if any"""
+    video_id = video_hashes.get(content_hash)
+    if video_id and videos_db.get(video_id, {}).get("status") not in ("error", "cancelled", "timed_out", "memory_exceeded"):
+        return video_id
+    return None
+
+def schedule_batch(batch_id):
+    """Hash each batch item, mark duplicates and queue the rest into the shared pipeline"""
+    start_pipeline_workers()
+    for video_id in batches_db[batch_id]["items"]:
+        video = videos_db[video_id]
+        try:
+            content_hash = file_content_hash(video["path"])
+        except OSError as e:
+            video["status"] = "error"
+            video["error"] = f"Could not read file: {str(e)}"
+            release_job_resources(video_id)
+            continue
         
-        # Update video record with course ID
-        videos_db[video_id]["course_id"] = course_id
-        videos_db[video_id]["status"] = "completed"
+        duplicate_of = find_duplicate_video(content_hash)
+        if duplicate_of:
+            video["status"] = "duplicate"
+            video["duplicate_of"] = duplicate_of
+            release_job_resources(video_id)
+            continue
         
-    except Exception as e:
-        logger.error(f"Error processing video {video_id}: {str(e)}")
-        videos_db[video_id]["status"] = "error"
-        videos_db[video_id]["error"] = str(e)
+        video_hashes[content_hash] = video_id
+        video["status"] = "queued"
+        enqueue_pipeline_item(0, batch_id, video_id)
+
+def create_video_record(video_id, file_path, filename, title, mode, local_source=False):
+    """Store a new video's metadata and its job control"""
+    videos_db[video_id] = {
+        "id": video_id,
+        "title": title,
+        "filename": filename,
+        "path": file_path,
+        "status": "uploaded",
+        "transcript": None,
+        "course_id": None,
+        "mode": mode
+    }
+    if local_source:
+        videos_db[video_id]["local_source"] = True
+    job_controls[video_id] = new_job_control()
+
+def is_video_filename(filename):
+    """Check a file name has one of the accepted video extensions"""
+    return filename.lower().endswith(('.mp4', '.mov', '.avi', '.wmv'))
+
+def resolve_ingest_paths(data):
+    """Expand the paths, directory or manifest of a batch request into (path, title, mode) entries
+
+    paths and a JSON manifest must be lists of path strings or of objects
+    with a string "path" (and optional "title" and "mode"). Only files under
+    INGEST_ROOT can be ingested; raises ValueError otherwise.
+    """
+    if not INGEST_ROOT:
+        raise ValueError("Ingesting local paths is disabled (set INGEST_ROOT)")
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    root = os.path.realpath(INGEST_ROOT)
+    
+    def check_entries(entries, source):
+        if not isinstance(entries, list):
+            raise ValueError(f"{source} must be a list")
+        for entry in entries:
+            if isinstance(entry, str):
+                continue
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+                raise ValueError(f"Each {source} entry must be a path or an object with a \"path\"")
+            if not all(isinstance(entry.get(key), (str, type(None))) for key in ('title', 'mode')):
+                raise ValueError(f"The title and mode of a {source} entry must be strings")
+        return entries
+    
+    for key in ('directory', 'manifest'):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            raise ValueError(f"{key} must be a path")
+    
+    def resolve(path):
+        full_path = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, full_path]) != root:
+            raise ValueError(f"Path is outside INGEST_ROOT: {path}")
+        return full_path
+    
+    entries = list(check_entries(data.get('paths', []), "paths"))
+    if data.get('directory'):
+        directory = resolve(data['directory'])
+        if not os.path.isdir(directory):
+            raise ValueError(f"Not a directory: {data['directory']}")
+        entries.extend(
+            os.path.join(directory, name) for name in sorted(os.listdir(directory)) if is_video_filename(name)
+        )
+    if data.get('manifest'):
+        with open(resolve(data['manifest']), encoding="utf-8") as f:
+            content = f.read()
+        try:
+            manifest = json.loads(content)
+        except json.JSONDecodeError:
+            manifest = None
+        if manifest is not None:
+            entries.extend(check_entries(manifest, "manifest"))
+        else:
+            entries.extend(line.strip() for line in content.splitlines() if line.strip())
+    
+    resolved = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        path = resolve(entry['path'])
+        if not os.path.isfile(path) or not is_video_filename(path):
+            raise ValueError(f"Not a video file: {entry['path']}")
+        resolved.append((path, entry.get('title'), entry.get('mode')))
+    return resolved
 
 @app.route('/upload-video/', methods=['POST'])
 def upload_video():
@@ -598,7 +2254,7 @@ def upload_video():
     if not file.filename:
         return jsonify({"error": "No selected file"}), 400
     
-    if not file.filename.lower().endswith(('.mp4', '.mov', '.avi', '.wmv')):
+    if not is_video_filename(file.filename):
         return jsonify({"error": "Invalid video file format"}), 400
     
     # Generate unique ID for the video
@@ -612,22 +2268,112 @@ def upload_video():
     # Store video metadata
     video_title = request.form.get('title', filename)
     generation_mode = request.form.get('mode', 'full')
-    videos_db[video_id] = {
-        "id": video_id,
-        "title": video_title,
-        "filename": filename,
-        "path": file_path,
-        "status": "uploaded",
-        "transcript": None,
-        "course_id": None,
-        "mode": generation_mode
-    }
+    create_video_record(video_id, file_path, filename, video_title, generation_mode)
     
     # Process the video in a background thread
-    threading.Thread(target=process_video, args=(video_id,)).start()
+    threading.Thread(target=process_uploaded_video, args=(video_id,)).start()
     
     return jsonify({"video_id": video_id, "title": video_title, "status": "processing"})
 
+@app.route('/upload-videos/', methods=['POST'])
+def upload_videos():
+    """Ingest a batch of videos (uploaded files, or local paths, a directory or a manifest) through the shared pipeline"""
+    batch_id = str(uuid.uuid4())
+    items = []
+    
+    if request.files:
+        files = request.files.getlist('files')
+        generation_mode = request.form.get('mode', 'full')
+        if not files or any(not file.filename or not is_video_filename(file.filename) for file in files):
+            return jsonify({"error": "Invalid video file format"}), 400
+        
+        for file in files:
+            video_id = str(uuid.uuid4())
+            filename = secure_filename(file.filename)
+            file_path = f"uploads/{video_id}_{filename}"
+            file.save(file_path)
+            create_video_record(video_id, file_path, filename, filename, generation_mode)
+            items.append(video_id)
+    else:
+        data = request.json or {}
+        try:
+            entries = resolve_ingest_paths(data)
+        except (ValueError, OSError) as e:
+            return jsonify({"error": str(e)}), 400
+        if not entries:
+            return jsonify({"error": "No videos provided"}), 400
+        
+        for path, title, mode in entries:
+            video_id = str(uuid.uuid4())
+            filename = os.path.basename(path)
+            create_video_record(video_id, path, filename, title or filename, mode or data.get('mode', 'full'),
+                                local_source=True)
+            items.append(video_id)
+    
+    for video_id in items:
+        videos_db[video_id]["batch_id"] = batch_id
+        videos_db[video_id]["status"] = "queued"
+    batches_db[batch_id] = {"id": batch_id, "created_at": time.time(), "items": items}
+    
+    # Hashing can take a while for large files, so it happens off the request thread
+    threading.Thread(target=schedule_batch, args=(batch_id,), daemon=True).start()
+    
+    return jsonify({
+        "batch_id": batch_id,
+        "items": [{"video_id": video_id, "title": videos_db[video_id]["title"]} for video_id in items],
+        "status": "queued"
+    })
+
+@app.route('/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Get per-item status and aggregate progress of a batch"""
+    if batch_id not in batches_db:
+        return jsonify({"error": "Batch not found"}), 404
+    
+    items = []
+    counts = {}
+    progress = 0.0
+    for video_id in batches_db[batch_id]["items"]:
+        video = videos_db[video_id]
+        status = video["status"]
+        course_id = video.get("course_id")
+        if status == "duplicate":
+            course_id = videos_db[video["duplicate_of"]].get("course_id")
+        items.append({
+            "video_id": video_id,
+            "title": video["title"],
+            "status": status,
+            "course_id": course_id,
+            "duplicate_of": video.get("duplicate_of"),
+            "error": video.get("error")
+        })
+        counts[status] = counts.get(status, 0) + 1
+        progress += BATCH_STATUS_PROGRESS.get(status, 1.0)
+    
+    total = len(items)
+    return jsonify({
+        "batch_id": batch_id,
+        "total": total,
+        "counts": counts,
+        "progress": progress / total if total else 1.0,
+        "done": all(item["status"] not in BATCH_STATUS_PROGRESS for item in items),
+        "items": items
+    })
+
+@app.route('/batch/<batch_id>/cancel', methods=['POST'])
+def cancel_batch(batch_id):
+    """Cancel every unfinished item of a batch"""
+    if batch_id not in batches_db:
+        return jsonify({"error": "Batch not found"}), 404
+    
+    cancelled = 0
+    for video_id in batches_db[batch_id]["items"]:
+        control = job_controls.get(video_id)
+        if control is not None:
+            control["cancel"].set()
+            cancelled += 1
+    return jsonify({"batch_id": batch_id, "cancelling": cancelled})
+
 @app.route('/video/<video_id>', methods=['GET'])
 def get_video_status(video_id):
     """Get the status of a video processing job"""
@@ -636,6 +2382,19 @@ def get_video_status(video_id):
     
     return jsonify(videos_db[video_id])
 
+@app.route('/video/<video_id>/cancel', methods=['POST'])
+def cancel_video(video_id):
+    """Cancel a video processing job"""
+    if video_id not in videos_db:
+        return jsonify({"error": "Video not found"}), 404
+    
+    control = job_controls.get(video_id)
+    if control is None:
+        return jsonify({"error": "Video is not being processed"}), 409
+    
+    control["cancel"].set()
+    return jsonify({"video_id": video_id, "status": "cancelling"})
+
 @app.route('/course/<course_id>', methods=['GET', 'PUT'])
 def course_operations(course_id):
     """Get or update a generated course by ID"""
@@ -650,20 +2409,428 @@ def course_operations(course_id):
             return jsonify({"error": "Course not found"}), 404
         
         # Update course with new data
-        updated_course = request.json
+        updated_course = request.get_json(silent=True)
+        if not isinstance(updated_course, dict) or not isinstance(updated_course.get('sections', []), list):
+            return jsonify({"error": "Course must be a JSON object with a list of sections"}), 400
         courses_db[course_id] = updated_course
         
+        try:
+            index_course(course_id, updated_course, course_videos.get(course_id))
+        except sqlite3.Error as e:
+            logger.error(f"Search indexing error for course {course_id}: {str(e)}")
+        
         return jsonify({"message": "Course updated successfully"})
 
+@app.route('/course/<course_id>/regenerate', methods=['POST'])
+def regenerate_course_part(course_id):
+    """Regenerate one section, scene or quiz question of a course from its stored transcript"""
+    if course_id not in courses_db:
+        return jsonify({"error": "Course not found"}), 404
+    
+    course = courses_db[course_id]
+    data = request.json or {}
+    section_index = data.get('section_index')
+    scene_index = data.get('scene_index')
+    question_index = data.get('question_index')
+    instructions = data.get('instructions')
+    
+    sections = course.get('sections', [])
+    if not isinstance(section_index, int) or not 0 <= section_index < len(sections):
+        return jsonify({"error": "Invalid section_index"}), 400
+    section = sections[section_index]
+    if scene_index is not None and (not isinstance(scene_index, int)
+                                    or not 0 <= scene_index < len(section.get('scenes', []))):
+        return jsonify({"error": "Invalid scene_index"}), 400
+    if question_index is not None and (not isinstance(question_index, int)
+                                       or not 0 <= question_index < len(section.get('questions', []))):
+        return jsonify({"error": "Invalid question_index"}), 400
+    
+    video = videos_db.get(course_videos.get(course_id), {})
+    if not video.get('transcript'):
+        return jsonify({"error": "Transcript not available for this course"}), 400
+    mode = video.get('mode', 'full')
+    snapshots = video.get('snapshots')
+    
+    try:
+        span = transcript_span(video['transcript'], course, section_index, scene_index)
+        
+        if scene_index is not None:
+            new_scene = generate_course_scene(span, course, section_index, scene_index, mode, instructions)
+            scene = section['scenes'][scene_index]
+            scene['narration'] = new_scene['narration']
+            scene['scene_type'] = new_scene.get('scene_type', scene.get('scene_type'))
+            if 'video_snapshot' not in scene:
+                add_snapshots_to_course(course, snapshots, section_index, scene_index)
+        elif question_index is not None:
+            section['questions'][question_index] = generate_quiz_question(
+                span, course, section_index, question_index, instructions
+            )
+        else:
+            sections[section_index] = generate_course_section(
+                span, course, section_index, mode, instructions=instructions
+            )
+            add_snapshots_to_course(course, snapshots, section_index)
+        
+        index_course(course_id, course, course_videos.get(course_id))
+    
+    except Exception as e:
+        logger.error(f"Regeneration error for course {course_id}: {str(e)}")
+        return jsonify({"error": "Regeneration failed"}), 500
+    
+    return jsonify({
+        "message": "Course updated successfully",
+        "section_index": section_index,
+        "section": sections[section_index]
+    })
+
+def pagination_args(default_limit=20, max_limit=100):
+    """Read limit/offset query parameters, clamped to sane values"""
+    limit = request.args.get('limit', default_limit, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    return max(1, min(limit, max_limit)), max(0, offset)
+
+@app.route('/api/search', methods=['GET'])
+def search():
+    """Search transcripts and course content"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    
+    kind = request.args.get('type')
+    if kind and kind not in ('course', 'scene', 'quiz', 'transcript'):
+        return jsonify({"error": "Invalid type"}), 400
+    limit, offset = pagination_args()
+    
+    try:
+        results, has_more = search_index_query(query, kind, limit, offset)
+    except sqlite3.Error as e:
+        logger.error(f"Search error: {str(e)}")
+        return jsonify({"error": "Search failed"}), 500
+    
+    return jsonify({"query": query, "results": results, "limit": limit, "offset": offset, "has_more": has_more})
+
+@app.route('/api/courses', methods=['GET'])
+def list_courses():
+    """List generated courses, most recently updated first"""
+    limit, offset = pagination_args()
+    courses, total = list_catalog_courses(limit, offset)
+    return jsonify({"courses": courses, "total": total, "limit": limit, "offset": offset})
+
+# Third-party bundles loaded from CDNs by index.html: (URL in the page, local name, pinned download URL)
+VENDOR_ASSETS = [
+    ("https://unpkg.com/react@17/umd/react.production.min.js", "react.production.min.js",
+     "https://unpkg.com/react@17.0.2/umd/react.production.min.js"),
+    ("https://unpkg.com/react-dom@17/umd/react-dom.production.min.js", "react-dom.production.min.js",
+     "https://unpkg.com/react-dom@17.0.2/umd/react-dom.production.min.js"),
+    ("https://unpkg.com/@babel/standalone/babel.min.js", "babel.min.js",
+     "https://unpkg.com/@babel/standalone@7.23.5/babel.min.js"),
+    ("https://cdn.tailwindcss.com", "tailwindcss.js",
+     "https://cdn.tailwindcss.com/3.3.5"),
+    ("https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css", "bootstrap.min.css",
+     "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css"),
+    ("https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css", "bootstrap-icons.css",
+     "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/bootstrap-icons.css"),
+]
+VENDOR_FONTS = {
+    "bootstrap-icons.woff2": "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff2",
+    "bootstrap-icons.woff": "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.1/font/fonts/bootstrap-icons.woff",
+}
+
+# Compiles JSX with the vendored Babel standalone build under Node
+JSX_COMPILER = """
+const fs = require('fs');
+const Babel = require(process.argv[1]);
+const sources = JSON.parse(fs.readFileSync(0, 'utf8'));
+const compiled = {};
+for (const [name, source] of Object.entries(sources)) {
+    compiled[name] = Babel.transform(source, { presets: ['react'], filename: name }).code;
+}
+process.stdout.write(JSON.stringify(compiled));
+"""
+
+def download_vendor_assets():
+    """Download any missing third-party bundles into static/vendor"""
+    downloads = [(name, url) for _, name, url in VENDOR_ASSETS]
+    downloads += [(os.path.join("fonts", name), url) for name, url in VENDOR_FONTS.items()]
+    
+    for name, url in downloads:
+        path = os.path.join(STATIC_VENDOR_DIR, name)
+        if os.path.exists(path):
+            continue
+        logger.info(f"Downloading {url}")
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(response.content)
+
+def compile_jsx(sources):
+    """Compile JSX sources ahead of time, or return None if Node or Babel is unavailable"""
+    babel_path = os.path.abspath(os.path.join(STATIC_VENDOR_DIR, "babel.min.js"))
+    if not shutil.which("node") or not os.path.exists(babel_path):
+        logger.warning("Node or the vendored Babel build is missing; JSX will still be compiled in the browser")
+        return None
+    
+    result = subprocess.run(
+        ["node", "-e", JSX_COMPILER, babel_path],
+        input=json.dumps(sources), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        logger.error(f"JSX compilation failed: {result.stderr}")
+        return None
+    return json.loads(result.stdout)
+
+def write_fingerprinted_asset(name, content):
+    """Write content to static/dist under a content-hashed name, with gzip and brotli variants"""
+    stem, ext = os.path.splitext(name)
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    hashed_name = f"{stem}.{digest}{ext}"
+    path = os.path.join(STATIC_DIST_DIR, hashed_name)
+    
+    with open(path, "wb") as f:
+        f.write(content)
+    if ext in (".woff", ".woff2", ".png", ".jpg", ".jpeg", ".webp", ".gif"):
+        return hashed_name  # Already compressed
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content, quality=11))
+    return hashed_name
+
+def build_static_assets():
+    """Build static/dist: fingerprinted, precompressed assets and an index.html that references them"""
+    if os.path.isdir(STATIC_DIST_DIR):
+        shutil.rmtree(STATIC_DIST_DIR)
+    os.makedirs(STATIC_DIST_DIR)
+    manifest = {}
+    
+    with open(os.path.join("static", "index.html"), encoding="utf-8") as f:
+        html = f.read()
+    
+    # Fonts first so the icon stylesheet can point at their hashed names
+    fonts = {}
+    for name in VENDOR_FONTS:
+        path = os.path.join(STATIC_VENDOR_DIR, "fonts", name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                fonts[name] = write_fingerprinted_asset(name, f.read())
+    
+    for cdn_url, name, _ in VENDOR_ASSETS:
+        path = os.path.join(STATIC_VENDOR_DIR, name)
+        if not os.path.exists(path):
+            logger.warning(f"{name} is not vendored; keeping the CDN link")
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        if name == "bootstrap-icons.css":
+            content = re.sub(
+                rb'\./fonts/(bootstrap-icons\.woff2?)\?[^")]*',
+                lambda m: fonts.get(m.group(1).decode(), m.group(0).decode()).encode(),
+                content
+            )
+        manifest[f"vendor/{name}"] = write_fingerprinted_asset(name, content)
+        html = html.replace(f'"{cdn_url}"', f'"/dist/{manifest[f"vendor/{name}"]}"')
+    
+    js_dir = os.path.join("static", "js")
+    sources = {}
+    for name in sorted(os.listdir(js_dir)):
+        if name.endswith(".js"):
+            with open(os.path.join(js_dir, name), encoding="utf-8") as f:
+                sources[name] = f.read()
+    compiled = compile_jsx(sources)
+    
+    for name, source in sources.items():
+        content = compiled[name] if compiled else source
+        manifest[f"js/{name}"] = write_fingerprinted_asset(name, content.encode("utf-8"))
+        tag = f'<script src="/js/{name}" type="text/babel"></script>'
+        if compiled:
+            html = html.replace(tag, f'<script src="/dist/{manifest[f"js/{name}"]}"></script>')
+        else:
+            html = html.replace(tag, f'<script src="/dist/{manifest[f"js/{name}"]}" type="text/babel"></script>')
+    
+    if compiled:
+        # Nothing is left for Babel to do in the browser
+        html = re.sub(r'\s*<!-- Babel for JSX support -->\s*<script src="[^"]*babel[^"]*"></script>', '', html)
+    
+    with open(os.path.join(STATIC_DIST_DIR, "index.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+    with open(os.path.join(STATIC_DIST_DIR, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    
+    logger.info(f"Built {len(manifest)} static assets into {STATIC_DIST_DIR}")
+    return manifest
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """Vendor third-party bundles, precompile JSX and write fingerprinted, precompressed assets"""
+    download_vendor_assets()
+    build_static_assets()
+
+class ZipStreamBuffer:
+    """Write-only file object that lets ZipFile produce its output in chunks for streaming"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def replace_inline_images(value, pending, seen):
+    """Copy a course structure, swapping inline base64 images for references to bundle files
+
+    Each distinct image is listed once in pending as (bundle name, data URI);
+    nothing is decoded yet.
+    """
+    if isinstance(value, dict):
+        return {key: replace_inline_images(item, pending, seen) for key, item in value.items()}
+    if isinstance(value, list):
+        return [replace_inline_images(item, pending, seen) for item in value]
+    if isinstance(value, str) and value.startswith("data:image/"):
+        header, _, _ = value[:100].partition(",")
+        if not header.endswith(";base64"):
+            return value
+        if value not in seen:
+            extension = mimetypes.guess_extension(header[5:-7]) or ".bin"
+            seen[value] = f"images/{hashlib.sha256(value.encode()).hexdigest()[:20]}{extension}"
+            pending.append((seen[value], value))
+        return {BUNDLE_IMAGE_KEY: seen[value]}
+    return value
+
+def generate_course_bundle(course_id, course):
+    """Stream a course bundle zip: manifest, MessagePack course structure and each distinct image once"""
+    buffer = ZipStreamBuffer()
+    pending = []
+    structure = replace_inline_images(course, pending, {})
+    
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        # Images are already compressed, so they are stored as-is
+        for name, data_uri in pending:
+            bundle.writestr(name, base64.b64decode(data_uri.partition(",")[2]), compress_type=zipfile.ZIP_STORED)
+            yield buffer.drain()
+        
+        bundle.writestr("course.msgpack", msgpack.packb(structure), compress_type=zipfile.ZIP_DEFLATED)
+        bundle.writestr("manifest.json", json.dumps({
+            "format": "course-bundle",
+            "version": BUNDLE_FORMAT_VERSION,
+            "course_id": course_id,
+            "title": course.get("title", ""),
+            "images": len(pending)
+        }))
+    yield buffer.drain()
+
+def load_course_bundle(path):
+    """Read a course bundle zip back into a course with inline base64 images"""
+    with zipfile.ZipFile(path) as bundle:
+        manifest = json.loads(bundle.read("manifest.json"))
+        if not isinstance(manifest, dict) or manifest.get("format") != "course-bundle" or manifest.get("version") != BUNDLE_FORMAT_VERSION:
+            raise ValueError("Unsupported bundle format")
+        structure = msgpack.unpackb(bundle.read("course.msgpack"))
+        if not isinstance(structure, dict) or not isinstance(structure.get("sections", []), list):
+            raise ValueError("Course must be an object with a list of sections")
+        
+        # Each image is read once; scenes sharing it share the same string
+        images = {}
+        
+        def restore(value):
+            if isinstance(value, dict):
+                if len(value) == 1 and BUNDLE_IMAGE_KEY in value:
+                    name = value[BUNDLE_IMAGE_KEY]
+                    if not isinstance(name, str):
+                        raise ValueError("Invalid image reference")
+                    if name not in images:
+                        mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                        images[name] = f"data:{mime};base64,{base64.b64encode(bundle.read(name)).decode()}"
+                    return images[name]
+                return {key: restore(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [restore(item) for item in value]
+            return value
+        
+        return restore(structure)
+
+def send_static_asset(path):
+    """Serve a static file, preferring a precompressed variant for fingerprinted build assets"""
+    if not path.startswith("dist/") or path in ("dist/index.html", "dist/manifest.json"):
+        return send_from_directory('static', path)
+    
+    response = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(app.static_folder, path + suffix)):
+            response = send_from_directory('static', path + suffix, mimetype=mimetypes.guess_type(path)[0])
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory('static', path)
+    
+    # Names change whenever content does, so these can be cached forever
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/course/<course_id>/export', methods=['GET'])
+def export_course(course_id):
+    """Download a course as a compact bundle (zip with MessagePack structure and de-duplicated images)"""
+    if course_id not in courses_db:
+        return jsonify({"error": "Course not found"}), 404
+    
+    return Response(
+        generate_course_bundle(course_id, courses_db[course_id]),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="course-{course_id}.zip"'}
+    )
+
+@app.route('/course/import', methods=['POST'])
+def import_course():
+    """Create a course from an uploaded course bundle"""
+    with tempfile.NamedTemporaryFile(suffix='.zip') as bundle_file:
+        # Spool the upload to disk; the zip directory is at the end of the file
+        if 'file' in request.files:
+            request.files['file'].save(bundle_file)
+        else:
+            shutil.copyfileobj(request.stream, bundle_file)
+        bundle_file.flush()
+        
+        try:
+            course = load_course_bundle(bundle_file.name)
+        except (zipfile.BadZipFile, KeyError, ValueError, msgpack.UnpackException) as e:
+            logger.error(f"Course import error: {str(e)}")
+            return jsonify({"error": "Invalid course bundle"}), 400
+    
+    course_id = str(uuid.uuid4())
+    courses_db[course_id] = course
+    
+    try:
+        index_course(course_id, course)
+    except sqlite3.Error as e:
+        logger.error(f"Search indexing error for course {course_id}: {str(e)}")
+    
+    return jsonify({"course_id": course_id, "title": course.get("title", "")})
+
 @app.route('/', methods=['GET'])
 def index():
-    """Serve the index.html file"""
-    return send_from_directory('static', 'index.html')
+    """Serve the index.html file, using the built one when static assets have been built"""
+    if os.path.exists(os.path.join(STATIC_DIST_DIR, 'index.html')):
+        response = send_from_directory(STATIC_DIST_DIR, 'index.html')
+    else:
+        response = send_from_directory('static', 'index.html')
+    # Always revalidate so a new build is picked up straight away
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/<path:path>', methods=['GET'])
 def serve_static(path):
     """Serve static files"""
-    return send_from_directory('static', path)
+    return send_static_asset(path)
 
 @app.route('/api', methods=['GET'])
 def api_root():
@@ -688,50 +2855,172 @@ def list_images():
 def analyze_content_quality(text, content_type="narration"):
     """Analyze content quality and provide enhancement suggestions"""
     try:
-        response = openai.ChatCompletion.create(
+        return request_content_analysis(text, content_type)
+    
+    except Exception as e:
+        logger.error(f"Content analysis error: {str(e)}")
+        return default_content_analysis(text)
+
+def request_content_analysis(text, content_type="narration"):
+    """Ask the model to analyze one text, raising if the call or its output fails"""
+    response = call_model(openai.ChatCompletion.create,
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": f"""
+            You are an expert educational content analyst. Analyze the following {content_type} text and provide specific, actionable suggestions for improvement.
+            
+            Return a JSON response with:
+            {{
+                "overall_score": 0-100,
+                "clarity_score": 0-100,
+                "engagement_score": 0-100,
+                "accessibility_score": 0-100,
+                "suggestions": [
+                    {{
+                        "type": "clarity|engagement|accessibility|structure",
+                        "priority": "high|medium|low",
+                        "suggestion": "Specific improvement suggestion",
+                        "reason": "Why this improvement helps"
+                    }}
+                ],
+                "improved_text": "Enhanced version of the text",
+                "key_insights": [
+                    "Key insights about the content"
+                ]
+            }}
+            """},
+            {"role": "user", "content": text}
+        ]
+    )
+    
+    analysis, _ = parse_json_lenient(response.choices[0].message['content'])
+    if not isinstance(analysis, dict):
+        raise ValueError("Analysis is not a JSON object")
+    return analysis
+
+def default_content_analysis(text):
+    """Neutral analysis returned when the model call fails"""
+    return {
+        "overall_score": 75,
+        "clarity_score": 75,
+        "engagement_score": 75,
+        "accessibility_score": 75,
+        "suggestions": [],
+        "improved_text": text,
+        "key_insights": ["Analysis temporarily unavailable"]
+    }
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token for English text)"""
+    return max(1, len(text or "") // 4)
+
+def pack_analysis_batches(items, token_budget=None, max_items=None):
+    """Group items into batches whose combined text stays within the token budget"""
+    token_budget = token_budget or ANALYSIS_BATCH_TOKEN_BUDGET
+    max_items = max_items or ANALYSIS_BATCH_MAX_ITEMS
+    
+    batches = []
+    current = []
+    current_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(item['text'])
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+def analyze_content_batch(items, content_type="narration"):
+    """Analyze several texts in a single model call, returning one result per item
+
+    The model sees positional ids, so items that share a client id still get
+    their own analysis. Items the model call or its reply fails for come back
+    with "analysis": None and an "error" instead of made-up scores.
+    """
+    if len(items) == 1:
+        item = items[0]
+        try:
+            return [dict(item, analysis=request_content_analysis(item['text'], content_type))]
+        except Exception as e:
+            logger.error(f"Content analysis error: {str(e)}")
+            return [dict(item, analysis=None, error="analysis unavailable")]
+    
+    try:
+        payload = [{"id": str(index), "text": item['text']} for index, item in enumerate(items)]
+        response = call_model(openai.ChatCompletion.create,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": f"""
-                You are an expert educational content analyst. Analyze the following {content_type} text and provide specific, actionable suggestions for improvement.
+                You are an expert educational content analyst. You will receive a JSON array of {content_type} texts, each with an "id".
+                Analyze EACH text independently and provide specific, actionable suggestions for improvement.
                 
-                Return a JSON response with:
+                Return a JSON response with one entry per input text, in any order:
                 {{
-                    "overall_score": 0-100,
-                    "clarity_score": 0-100,
-                    "engagement_score": 0-100,
-                    "accessibility_score": 0-100,
-                    "suggestions": [
+                    "results": [
                         {{
-                            "type": "clarity|engagement|accessibility|structure",
-                            "priority": "high|medium|low",
-                            "suggestion": "Specific improvement suggestion",
-                            "reason": "Why this improvement helps"
+                            "id": "the id of the analyzed text",
+                            "overall_score": 0-100,
+                            "clarity_score": 0-100,
+                            "engagement_score": 0-100,
+                            "accessibility_score": 0-100,
+                            "suggestions": [
+                                {{
+                                    "type": "clarity|engagement|accessibility|structure",
+                                    "priority": "high|medium|low",
+                                    "suggestion": "Specific improvement suggestion",
+                                    "reason": "Why this improvement helps"
+                                }}
+                            ],
+                            "improved_text": "Enhanced version of the text",
+                            "key_insights": [
+                                "Key insights about the content"
+                            ]
                         }}
-                    ],
-                    "improved_text": "Enhanced version of the text",
-                    "key_insights": [
-                        "Key insights about the content"
                     ]
                 }}
                 """},
-                {"role": "user", "content": text}
+                {"role": "user", "content": json.dumps(payload)}
             ]
         )
         
-        analysis = json.loads(response.choices[0].message['content'])
-        return analysis
+        parsed, _ = parse_json_lenient(response.choices[0].message['content'])
+        by_id = {}
+        for entry in parsed.get('results', []) if isinstance(parsed, dict) else []:
+            if isinstance(entry, dict) and 'id' in entry:
+                by_id[str(entry.pop('id'))] = entry
     
     except Exception as e:
-        logger.error(f"Content analysis error: {str(e)}")
-        return {
-            "overall_score": 75,
-            "clarity_score": 75,
-            "engagement_score": 75,
-            "accessibility_score": 75,
-            "suggestions": [],
-            "improved_text": text,
-            "key_insights": ["Analysis temporarily unavailable"]
-        }
+        logger.error(f"Batch content analysis error: {str(e)}")
+        by_id = {}
+    
+    results = []
+    for index, item in enumerate(items):
+        analysis = by_id.get(str(index))
+        if analysis is None:
+            results.append(dict(item, analysis=None, error="analysis unavailable"))
+        else:
+            results.append(dict(item, analysis=analysis))
+    return results
+
+def collect_course_narrations(course):
+    """List every scene narration in a course with its section/scene position"""
+    items = []
+    for section_index, section in enumerate(course.get('sections', [])):
+        for scene_index, scene in enumerate(section.get('scenes', [])):
+            text = scene.get('narration', '')
+            if text:
+                items.append({
+                    "id": f"{section_index}:{scene_index}",
+                    "section_index": section_index,
+                    "scene_index": scene_index,
+                    "text": text
+                })
+    return items
 
 def generate_content_suggestions(course_data, section_index=None, scene_index=None):
     """Generate AI-powered content suggestions for course improvement"""
@@ -750,7 +3039,7 @@ def generate_content_suggestions(course_data, section_index=None, scene_index=No
             ])
             context = "Entire course content"
         
-        response = openai.ChatCompletion.create(
+        response = call_model(openai.ChatCompletion.create,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": """
@@ -830,6 +3119,52 @@ def analyze_content():
         logger.error(f"Content analysis endpoint error: {str(e)}")
         return jsonify({"error": "Analysis failed"}), 500
 
+@app.route('/api/analyze-content/batch', methods=['POST'])
+def analyze_content_batch_endpoint():
+    """Analyze many scenes at once, streaming one NDJSON line per scene as batches complete"""
+    data = request.json or {}
+    content_type = data.get('type', 'narration')
+    
+    if data.get('course_id'):
+        if data['course_id'] not in courses_db:
+            return jsonify({"error": "Course not found"}), 404
+        items = collect_course_narrations(courses_db[data['course_id']])
+    else:
+        scenes = data.get('scenes', [])
+        if not isinstance(scenes, list):
+            return jsonify({"error": "scenes must be a list"}), 400
+        items = []
+        for index, scene in enumerate(scenes):
+            if isinstance(scene, str):
+                scene = {"text": scene}
+            if not isinstance(scene, dict):
+                return jsonify({"error": f"Scene {index} must be a string or an object"}), 400
+            text = scene.get('text') or scene.get('narration', '')
+            if not isinstance(text, str):
+                return jsonify({"error": f"Scene {index} text must be a string"}), 400
+            if text:
+                items.append({"id": str(scene.get('id', index)), "text": text})
+    
+    if not items:
+        return jsonify({"error": "No text provided"}), 400
+    
+    batches = pack_analysis_batches(items)
+    logger.info(f"Analyzing {len(items)} scenes in {len(batches)} batches")
+    
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=ANALYSIS_MAX_WORKERS)
+        try:
+            futures = [executor.submit(analyze_content_batch, batch, content_type) for batch in batches]
+            for future in as_completed(futures):
+                for result in future.result():
+                    result.pop('text', None)
+                    yield json.dumps(result) + "\n"
+            yield json.dumps({"done": True, "count": len(items), "batches": len(batches)}) + "\n"
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/content-suggestions/<course_id>', methods=['GET', 'POST'])
 def content_suggestions(course_id):
     """Get AI-powered content suggestions for a course"""
@@ -0,0 +1,70 @@
+"""
+Benchmark segmented snapshot extraction against the number of worker processes.
+Run it with a real recording, or let it generate a synthetic test video:
+
+    python benchmark_snapshots.py path/to/video.mp4
+    python benchmark_snapshots.py --synthetic 300 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from app import extract_video_snapshots
+
+def make_synthetic_video(seconds, width=1920, height=1080, fps=30):
+    """Write a test video with a new 'slide' every few seconds and some motion"""
+    path = os.path.join(tempfile.gettempdir(), f"snapshot_benchmark_{seconds}s.mp4")
+    if os.path.exists(path):
+        return path
+
+    print(f"Generating {seconds}s synthetic video at {width}x{height}...")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    slide = None
+    for i in range(seconds * fps):
+        if i % (fps * 5) == 0:
+            slide = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+            slide = cv2.resize(slide, (width, height), interpolation=cv2.INTER_NEAREST)
+        frame = slide.copy()
+        cv2.putText(frame, f"frame {i}", (50 + i % 500, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+def main():
+    """Time snapshot extraction for each worker count and print the speedup"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="video file to benchmark")
+    parser.add_argument("--synthetic", type=int, default=120, help="length in seconds of the generated video")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--snapshots", type=int, default=15)
+    args = parser.parse_args()
+
+    video_path = args.video or make_synthetic_video(args.synthetic)
+    if not os.path.exists(video_path):
+        print(f"Video not found: {video_path}")
+        sys.exit(1)
+
+    print(f"Video: {video_path}")
+
+    start = time.perf_counter()
+    snapshots = extract_video_snapshots(video_path, args.snapshots, workers=0)
+    baseline = time.perf_counter() - start
+    print(f"Seek mode (single thread, the default): {baseline:.2f}s, {len(snapshots)} snapshots")
+
+    # Speedup is measured against seek mode, since that is what workers replace
+    print(f"\n{'workers':>8} {'seconds':>9} {'speedup':>8} {'snapshots':>10}")
+    for workers in sorted(set(args.workers)):
+        start = time.perf_counter()
+        snapshots = extract_video_snapshots(video_path, args.snapshots, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(snapshots):>10}")
+
+if __name__ == "__main__":
+    main()
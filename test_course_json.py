@@ -0,0 +1,95 @@
+"""
+Tests for repairing and salvaging course JSON from model output.
+Run with: python -m pytest test_course_json.py
+"""
+
+import json
+
+from app import parse_course_json, repair_json_text, validate_course_section
+
+def content_section(title, narration="Some narration"):
+    """A valid content section with one scene"""
+    return {"type": "content", "title": title, "scenes": [{"narration": narration}]}
+
+def course_text(sections, metadata=None):
+    """Serialized course document as the model would return it"""
+    course = {"title": "Course", "description": "About it", "sections": sections}
+    if metadata is not None:
+        course["metadata"] = metadata
+    return json.dumps(course)
+
+def section_titles(course):
+    """Titles of the sections of a parsed course"""
+    return [section.get("title") for section in course["sections"]]
+
+def test_repair_drops_trailing_commas():
+    """Trailing commas before closing brackets are removed"""
+    repaired, truncated = repair_json_text('{"a": [1, 2,], "b": {"c": 3,},}')
+    assert json.loads(repaired) == {"a": [1, 2], "b": {"c": 3}}
+    assert not truncated
+
+def test_repair_closes_truncated_document():
+    """A cut-off document is cut back to its last complete value and closed"""
+    repaired, truncated = repair_json_text('{"a": [1, 2], "b": "unfinish')
+    assert json.loads(repaired) == {"a": [1, 2]}
+    assert truncated
+
+def test_parse_complete_course():
+    """Well-formed output parses as is"""
+    course, truncated = parse_course_json(course_text([content_section("One"), content_section("Two")]))
+    assert section_titles(course) == ["One", "Two"]
+    assert not truncated
+
+def test_parse_course_with_trailing_commas():
+    """Trailing commas in otherwise complete output don't lose any sections"""
+    text = course_text([content_section("One"), content_section("Two")]).replace("}]", "},]")
+    course, truncated = parse_course_json(text)
+    assert section_titles(course) == ["One", "Two"]
+    assert not truncated
+
+def test_truncated_inside_section():
+    """Output cut off inside a section keeps the complete sections and is flagged as truncated"""
+    text = course_text([content_section("One"), content_section("Two", "x" * 50)])
+    course, truncated = parse_course_json(text[:text.rindex("x" * 10)])
+    assert section_titles(course)[0] == "One"
+    assert truncated
+
+def test_truncated_inside_metadata():
+    """Output cut off after the sections array has every section, so it is not truncated"""
+    text = course_text([content_section("One"), content_section("Two")], metadata={"level": "beginner", "tags": ["a", "b"]})
+    course, truncated = parse_course_json(text[:text.index('"tags"') + 12])
+    assert section_titles(course) == ["One", "Two"]
+    assert course["metadata"]["level"] == "beginner"
+    assert not truncated
+
+def test_prose_between_sections():
+    """Stray prose between sections is skipped without picking up later objects as sections"""
+    sections = json.dumps(content_section("One")) + ", (and then) " + json.dumps(content_section("Two"))
+    text = '{"title": "Course", "sections": [%s, oops ], "metadata": {"level": "beginner"}}' % sections
+    course, truncated = parse_course_json(text)
+    assert section_titles(course) == ["One", "Two"]
+    assert course["metadata"] == {"level": "beginner"}
+    assert not truncated
+
+def test_fenced_output():
+    """A fenced code block with text around it parses like bare JSON"""
+    text = "Here is your course:\n```json\n" + course_text([content_section("One")]) + "\n```\nEnjoy!"
+    course, truncated = parse_course_json(text)
+    assert course["title"] == "Course"
+    assert section_titles(course) == ["One"]
+    assert not truncated
+
+def test_validate_content_section():
+    """Content sections need a title and a narration for every scene"""
+    assert validate_course_section(content_section("One")) == []
+    assert validate_course_section({"title": " ", "scenes": []}) == ["missing title", "section has no scenes"]
+    assert validate_course_section({"title": "One", "scenes": [{"narration": ""}]}) == ["scene 0 has no narration"]
+    assert validate_course_section("not a section") == ["section is not an object"]
+
+def test_validate_quiz_section():
+    """Quiz questions need a question, options and a correct answer among the options"""
+    question = {"question": "Why?", "options": {"A": "Yes", "B": "No"}, "correct_answer": "A"}
+    assert validate_course_section({"type": "quiz", "title": "Quiz", "questions": [question]}) == []
+    broken = dict(question, correct_answer="C")
+    assert validate_course_section({"type": "quiz", "title": "Quiz", "questions": [broken]}) == ["question 0 is incomplete"]
+    assert validate_course_section({"type": "quiz", "title": "Quiz", "questions": []}) == ["quiz has no questions"]
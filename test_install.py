@@ -22,7 +22,8 @@ def main():
         "openai",
         "dotenv",
         "moviepy",
-        "werkzeug"
+        "werkzeug",
+        "msgpack"
     ]
     
     all_ok = True
@@ -0,0 +1,44 @@
+"""
+Tests for speech detection on synthetic per-frame levels.
+Run with: python -m pytest test_speech_detection.py
+"""
+
+import numpy as np
+
+from app import VAD_FRAME_SECONDS, detect_speech_regions
+
+def frames(seconds):
+    """Number of VAD frames in a stretch of audio"""
+    return int(round(seconds / VAD_FRAME_SECONDS))
+
+def levels_between(rng, seconds, low, high):
+    """Random frame levels in dBFS for a stretch of audio"""
+    return rng.uniform(low, high, frames(seconds))
+
+def test_cuts_long_silence():
+    """A long silence between two stretches of speech is cut"""
+    rng = np.random.default_rng(0)
+    levels = np.concatenate([
+        levels_between(rng, 30, -20, -12),
+        levels_between(rng, 30, -75, -70),
+        levels_between(rng, 30, -20, -12)
+    ])
+    regions = detect_speech_regions(levels)
+    assert len(regions) == 2
+    assert regions[0][1] < 31 and regions[1][0] > 59
+
+def test_keeps_quieter_speaker_without_silence():
+    """A quieter speaker is not mistaken for silence when the recording has almost none"""
+    rng = np.random.default_rng(0)
+    levels = np.concatenate([
+        levels_between(rng, 300, -20, -12),
+        levels_between(rng, 300, -36, -28)
+    ])
+    regions = detect_speech_regions(levels)
+    assert len(regions) == 1
+    assert regions[0][0] == 0 and regions[0][1] >= 599
+
+def test_silent_audio_has_no_speech():
+    """Audio at the noise floor throughout has no speech regions"""
+    rng = np.random.default_rng(0)
+    assert detect_speech_regions(levels_between(rng, 60, -75, -70)) == []